@@ -7,7 +7,7 @@ Config: Bot Config
 import logging
 import sys
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Literal
 
 from pydantic import ValidationError, field_validator
 from pydantic.networks import UrlConstraints
@@ -49,6 +49,19 @@ class Config(BaseSettings):
 
     MONGO_DB_URL: MongoSRVDsn
     MONGO_DB_NAME: str = "LX-File-Share"
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_CONNECT_TIMEOUT_MS: int = 20000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 30000
+    MONGO_SOCKET_TIMEOUT_MS: int | None = None
+    MONGO_READ_PREFERENCE: Literal[
+        "primary",
+        "primaryPreferred",
+        "secondary",
+        "secondaryPreferred",
+        "nearest",
+    ] = "primary"
+    MONGO_QUERY_PLAN_CHECK: bool = False
 
     # Bot main config
     WEBSITE_URL_MODE: bool = False
@@ -57,12 +70,46 @@ class Config(BaseSettings):
     USERNAME: str = "ZeroHaxJI"
     
     RATE_LIMITER: bool = True
+    RATE_LIMITER_SWEEP_BATCH: int = 2
+    RATE_LIMITER_MAX_CHATS: int = 1000000
+    RATE_LIMITER_MODE: Literal["drop", "defer", "sleep"] = "defer"
+    RATE_LIMITER_QUEUE_SIZE: int = 5
+    SEND_GLOBAL_RATE: float = 30
+    SEND_CHAT_RATE: float = 1
+    SEND_CHAT_BURST: int = 3
+    SEND_MAX_RETRIES: int = 3
+    DELIVERY_CHUNK_RETRIES: int = 2
+    DELIVERY_FALLBACK_CONCURRENCY: int = 4
+    DELIVERY_WORKERS: int = 8
+    DELIVERY_QUANTUM: int = 100
+    DELIVERY_SMALL_SIZE: int = 10
+    DELIVERY_DEDUPE_SECONDS: int = 60
+    DELIVERY_DEDUPE_SIZE: int = 100000
+    LINK_CACHE_SIZE: int = 1024
+    LINK_CACHE_SECONDS: int = 300
+    LINK_CACHE_REFRESH_SECONDS: int = 10
+    DELETED_BACKUP_CACHE_SIZE: int = 4096
     BACKUP_CHANNEL: int
     ROOT_ADMINS_ID: list[int]
+    ADMINS_REFRESH_SECONDS: int = 30
+    BANS_REFRESH_SECONDS: int = 30
     PRIVATE_REQUEST: bool = False
     PROTECT_CONTENT: bool = True
     FORCE_SUB_CHANNELS: list[int] = []
+    SUBSCRIPTION_CACHE_SIZE: int = 500000
+    SUBSCRIPTION_CACHE_SECONDS: int = 21600
+    FORCE_SUB_CONCURRENCY: int = 10
     AUTO_GENERATE_LINK: bool = True
+    AUTO_DELETE_GRANULARITY: int = 15
+    AUTO_DELETE_BATCH_SIZE: int = 500
+    USER_WRITE_BATCH_SIZE: int = 500
+    USER_WRITE_FLUSH_SECONDS: int = 5
+    COUNTERS_RECONCILE_SECONDS: int = 3600
+    BROADCAST_BATCH_SIZE: int = 1000
+    BROADCAST_CONCURRENCY: int = 25
+    BROADCAST_CHECKPOINT_SECONDS: int = 10
+    BROADCAST_SNAPSHOT_DIR: str = "snapshots"
+    BROADCAST_SNAPSHOT_MAX_AGE: int = 86400
 
     # Injected Config
     channels_n_invite: dict[str, ChannelInfo] = {}
@@ -1,3 +1,4 @@
+from .client_registry import MongoClientRegistry
 from .mongo_db import MongoDB
 
-__all__ = ["MongoDB"]
+__all__ = ["MongoClientRegistry", "MongoDB"]
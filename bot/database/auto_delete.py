@@ -0,0 +1,66 @@
+import datetime
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING
+
+
+class AutoDelete:
+    db: AsyncIOMotorDatabase
+
+    async def push_auto_delete(self, chat_id: int, message_ids: list[int], delete_at: datetime.datetime) -> bool:
+        """
+        Adds messages to the persistent auto delete queue.
+
+        Messages of the same chat and due time share one queue document.
+
+        Parameters:
+            chat_id (int): The chat ID.
+            message_ids (list[int]): The list of message IDs to delete.
+            delete_at (datetime.datetime): When the messages should be deleted, rounded to a tick.
+
+        Returns:
+            bool: Whether the operation was successful.
+        """
+        collection = self.db["AutoDelete"]
+        result = await collection.update_one(
+            filter={"chat_id": chat_id, "delete_at": delete_at},
+            update={"$push": {"message_ids": {"$each": message_ids}}},
+            upsert=True,
+        )
+        return result.acknowledged
+
+    async def get_due_auto_deletes(self, limit: int) -> list[dict]:
+        """
+        Fetches queued deletions that are due, oldest first.
+
+        Parameters:
+            limit (int): The maximum amount of queued deletions to fetch.
+
+        Returns:
+            list[dict]: The due queued deletions.
+        """
+        collection = self.db["AutoDelete"]
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        cursor = collection.find({"delete_at": {"$lte": now}}).sort("delete_at", ASCENDING).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def clear_auto_deletes(self, queue_ids: list) -> None:
+        """
+        Removes processed deletions from the queue.
+
+        Parameters:
+            queue_ids (list): The IDs of the processed queue documents.
+        """
+        if queue_ids:
+            await self.db["AutoDelete"].delete_many({"_id": {"$in": queue_ids}})
+
+    async def postpone_auto_deletes(self, queue_ids: list, delete_at: datetime.datetime) -> None:
+        """
+        Moves queued deletions to a later due time, used when their chat is flood waited.
+
+        Parameters:
+            queue_ids (list): The IDs of the queue documents.
+            delete_at (datetime.datetime): The new due time, rounded to a tick.
+        """
+        if queue_ids:
+            await self.db["AutoDelete"].update_many({"_id": {"$in": queue_ids}}, {"$set": {"delete_at": delete_at}})
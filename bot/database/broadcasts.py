@@ -0,0 +1,123 @@
+import datetime
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+
+class Broadcasts:
+    db: AsyncIOMotorDatabase
+
+    async def create_broadcast(
+        self,
+        from_chat_id: int,
+        message_id: int,
+        notice_chat_id: int,
+        notice_message_id: int,
+        pin: bool,  # noqa: FBT001
+    ) -> dict:
+        """
+        Stores a new running broadcast.
+
+        Parameters:
+            from_chat_id (int): The chat of the message to broadcast.
+            message_id (int): The ID of the message to broadcast.
+            notice_chat_id (int): The chat of the progress message.
+            notice_message_id (int): The ID of the progress message.
+            pin (bool): Whether to pin the broadcasted message.
+
+        Returns:
+            dict: The broadcast document.
+        """
+        broadcast = {
+            "from_chat_id": from_chat_id,
+            "message_id": message_id,
+            "notice_chat_id": notice_chat_id,
+            "notice_message_id": notice_message_id,
+            "pin": pin,
+            "status": "running",
+            "snapshot": None,
+            "position": 0,
+            "last_user_id": None,
+            "successful": 0,
+            "unsuccessful": 0,
+            "started": datetime.datetime.now(tz=datetime.timezone.utc),
+        }
+        await self.db["Broadcasts"].insert_one(broadcast)
+        return broadcast
+
+    async def checkpoint_broadcast(
+        self,
+        broadcast_id: ObjectId,
+        position: int,
+        last_user_id: int | None,
+        successful: int,
+        unsuccessful: int,
+    ) -> bool:
+        """
+        Saves the progress of a broadcast so it can be resumed after a restart.
+
+        Parameters:
+            broadcast_id (ObjectId): The ID of the broadcast.
+            position (int): The offset into the audience snapshot every user before has been handled.
+            last_user_id (int | None): The user right before the position, None if no user was handled yet.
+            successful (int): The amount of successful sends.
+            unsuccessful (int): The amount of unsuccessful sends.
+
+        Returns:
+            bool: Whether the operation was successful.
+        """
+        result = await self.db["Broadcasts"].update_one(
+            filter={"_id": broadcast_id},
+            update={
+                "$set": {
+                    "position": position,
+                    "last_user_id": last_user_id,
+                    "successful": successful,
+                    "unsuccessful": unsuccessful,
+                },
+            },
+        )
+        return result.acknowledged
+
+    async def set_broadcast_snapshot(self, broadcast_id: ObjectId, snapshot: str) -> bool:
+        """
+        Saves the audience snapshot a broadcast is sent to.
+
+        Parameters:
+            broadcast_id (ObjectId): The ID of the broadcast.
+            snapshot (str): The path of the audience snapshot.
+
+        Returns:
+            bool: Whether the operation was successful.
+        """
+        result = await self.db["Broadcasts"].update_one(
+            filter={"_id": broadcast_id},
+            update={"$set": {"snapshot": snapshot}},
+        )
+        return result.acknowledged
+
+    async def finish_broadcast(self, broadcast_id: ObjectId, status: str) -> bool:
+        """
+        Marks a broadcast as finished or cancelled.
+
+        Parameters:
+            broadcast_id (ObjectId): The ID of the broadcast.
+            status (str): The final status, "finished" or "cancelled".
+
+        Returns:
+            bool: Whether the operation was successful.
+        """
+        result = await self.db["Broadcasts"].update_one(
+            filter={"_id": broadcast_id},
+            update={"$set": {"status": status}},
+        )
+        return result.acknowledged
+
+    async def get_running_broadcasts(self) -> list[dict]:
+        """
+        Fetches every broadcast that was still running, e.g. before a restart.
+
+        Returns:
+            list[dict]: The running broadcast documents.
+        """
+        return await self.db["Broadcasts"].find({"status": "running"}).to_list(length=None)
@@ -0,0 +1,77 @@
+import logging
+from typing import ClassVar
+
+import dns.resolver
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ConfigurationError
+
+from bot.config import config
+
+
+class MongoClientRegistry:
+    """
+    A process-wide registry of motor clients shared by every MongoDB instance.
+
+    Attributes:
+        _clients (ClassVar[dict[str, AsyncIOMotorClient]]): Motor clients keyed by their connection url.
+    """
+
+    logger = logging.getLogger(__name__)
+
+    _clients: ClassVar[dict[str, AsyncIOMotorClient]] = {}
+
+    @staticmethod
+    def client_options() -> dict[str, int | str | None]:
+        """
+        Builds the connection pool options from the config.
+
+        Returns:
+            dict[str, int | str | None]: Keyword arguments passed to AsyncIOMotorClient.
+        """
+        return {
+            "maxPoolSize": config.MONGO_MAX_POOL_SIZE,
+            "minPoolSize": config.MONGO_MIN_POOL_SIZE,
+            "connectTimeoutMS": config.MONGO_CONNECT_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "socketTimeoutMS": config.MONGO_SOCKET_TIMEOUT_MS,
+            "readPreference": config.MONGO_READ_PREFERENCE,
+        }
+
+    @classmethod
+    def get_client(cls, host: str | None = None) -> AsyncIOMotorClient:
+        """
+        Returns the shared client for a connection url, creating it on first use.
+
+        Parameters:
+            host (str | None): The connection url. Defaults to config.MONGO_DB_URL.
+
+        Returns:
+            AsyncIOMotorClient: The shared motor client.
+
+        Raises:
+            ConfigurationError: If the MongoDB connection configuration is invalid.
+        """
+        host = host if host else str(config.MONGO_DB_URL)
+        client = cls._clients.get(host)
+
+        if client is None:
+            try:
+                client = AsyncIOMotorClient(host=host, **cls.client_options())
+            except ConfigurationError:
+                dns.resolver.default_resolver = dns.resolver.Resolver(configure=False)
+                dns.resolver.default_resolver.nameservers = ["8.8.8.8"]
+                client = AsyncIOMotorClient(host=host, **cls.client_options())
+
+            cls._clients[host] = client
+            cls.logger.info("MongoDB client created, total clients: %d", len(cls._clients))
+
+        return client
+
+    @classmethod
+    def close_all(cls) -> None:
+        """
+        Closes every registered client, should only be called during shutdown.
+        """
+        for client in cls._clients.values():
+            client.close()
+        cls._clients.clear()
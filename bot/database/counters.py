@@ -0,0 +1,56 @@
+from typing import ClassVar
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+
+class Counters:
+    """
+    Keeps the amount of users, links and chats in a single counters document.
+
+    The writes that add or remove documents increment the counters, reconcile_counters resets them
+    to the collection metadata counts in the background so drift from failed or external writes heals.
+
+    Attributes:
+        COUNTED_COLLECTIONS (ClassVar[dict[str, str]]): The collection of every counter name.
+    """
+
+    db: AsyncIOMotorDatabase
+
+    COUNTED_COLLECTIONS: ClassVar[dict[str, str]] = {"users": "Users", "links": "Files", "chats": "groups"}
+
+    async def increment_counters(self, **deltas: int) -> None:
+        """
+        Increments counters of the counters document.
+
+        Parameters:
+            **deltas (int): The amount to add per counter name, e.g. users=1.
+        """
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if deltas:
+            await self.db["Counters"].update_one(filter={"_id": "stats"}, update={"$inc": deltas}, upsert=True)
+
+    async def reconcile_counters(self) -> dict[str, int]:
+        """
+        Resets every counter to the estimated document count of its collection.
+
+        Returns:
+            dict[str, int]: The reconciled counters.
+        """
+        counters = {
+            name: await self.db[collection_name].estimated_document_count()
+            for name, collection_name in self.COUNTED_COLLECTIONS.items()
+        }
+        await self.db["Counters"].update_one(filter={"_id": "stats"}, update={"$set": counters}, upsert=True)
+        return counters
+
+    async def get_counters(self) -> dict[str, int]:
+        """
+        Reads the counters document, reconciling it first if it doesn't exist yet.
+
+        Returns:
+            dict[str, int]: The counters by name.
+        """
+        counters = await self.db["Counters"].find_one({"_id": "stats"}, {"_id": 0})
+        if counters is None or any(name not in counters for name in self.COUNTED_COLLECTIONS):
+            return await self.reconcile_counters()
+        return counters
@@ -0,0 +1,97 @@
+import datetime
+import logging
+from typing import Any, ClassVar
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, IndexModel
+
+
+class Indexes:
+    """
+    Declares the indexes every collection needs and checks that the hot queries use them.
+
+    Files and BotSettings are only read by _id, which MongoDB always indexes.
+
+    Attributes:
+        INDEXES (ClassVar[dict[str, list[IndexModel]]]): The required secondary indexes per collection.
+        HOT_QUERIES (ClassVar[dict[str, tuple[str, dict, list]]]): Named (collection, filter, sort) of hot queries.
+    """
+
+    db: AsyncIOMotorDatabase
+
+    logger = logging.getLogger(__name__)
+
+    INDEXES: ClassVar[dict[str, list[IndexModel]]] = {
+        "Users": [
+            IndexModel([("banned", ASCENDING)], partialFilterExpression={"banned": True}),
+            IndexModel([("ban_updated", ASCENDING)], sparse=True),
+            IndexModel([("joined", ASCENDING)], sparse=True),
+        ],
+        "Files": [],
+        "groups": [IndexModel([("id", ASCENDING)])],
+        "admins": [IndexModel([("id", ASCENDING)])],
+        "BotSettings": [],
+        "AutoDelete": [IndexModel([("delete_at", ASCENDING), ("chat_id", ASCENDING)])],
+        "Broadcasts": [IndexModel([("status", ASCENDING)])],
+    }
+
+    EPOCH = datetime.datetime.fromtimestamp(0, tz=datetime.timezone.utc)
+    HOT_QUERIES: ClassVar[dict[str, tuple[str, dict, list]]] = {
+        "file link": ("Files", {"_id": ""}, []),
+        "user": ("Users", {"_id": 0}, []),
+        "banned users": ("Users", {"banned": True}, []),
+        "ban changes": ("Users", {"ban_updated": {"$gte": EPOCH}}, []),
+        "joined users": ("Users", {"joined": {"$gt": EPOCH}}, [("joined", ASCENDING)]),
+        "group": ("groups", {"id": 0}, []),
+        "admin": ("admins", {"id": 0}, []),
+        "setting": ("BotSettings", {"_id": ""}, []),
+        "due deletes": ("AutoDelete", {"delete_at": {"$lte": EPOCH}}, [("delete_at", ASCENDING)]),
+        "running broadcasts": ("Broadcasts", {"status": "running"}, []),
+    }
+
+    async def ensure_indexes(self) -> None:
+        """
+        Creates every declared index, existing indexes are left as they are.
+        """
+        for collection_name, indexes in self.INDEXES.items():
+            if indexes:
+                await self.db[collection_name].create_indexes(indexes)
+
+    @classmethod
+    def plan_stages(cls, plan: dict[str, Any]) -> set[str]:
+        """
+        Returns every stage of a query plan.
+
+        Parameters:
+            plan (dict[str, Any]): A winning plan of an explain output.
+
+        Returns:
+            set[str]: The stage names of the plan and its input stages.
+        """
+        stages = {plan["stage"]} if "stage" in plan else set()
+        for input_stage in [plan.get("inputStage"), *plan.get("inputStages", [])]:
+            if input_stage:
+                stages |= cls.plan_stages(input_stage)
+        if "queryPlan" in plan:
+            stages |= cls.plan_stages(plan["queryPlan"])
+        return stages
+
+    async def check_query_plans(self) -> list[str]:
+        """
+        Explains every hot query and logs the ones that scan a whole collection.
+
+        Returns:
+            list[str]: The names of the hot queries planned as a COLLSCAN.
+        """
+        collection_scans = []
+        for name, (collection_name, query, sort) in self.HOT_QUERIES.items():
+            cursor = self.db[collection_name].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            explain = await cursor.explain()
+
+            if "COLLSCAN" in self.plan_stages(explain["queryPlanner"]["winningPlan"]):
+                collection_scans.append(name)
+                self.logger.warning("Hot query %r scans the whole %s collection", name, collection_name)
+
+        return collection_scans
@@ -1,15 +1,17 @@
-from async_lru import alru_cache
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from .write_behind import WriteBehind
 
-class Listener:
+
+class Listener(WriteBehind):
     db: AsyncIOMotorDatabase
 
-    @alru_cache(maxsize=69, ttl=20)
     async def user_join_request(self, user_id: int, channel_id: int) -> bool:
         """
         Adds a private channel to the user's list of channels in the database.
 
+        The write is buffered and flushed in bulk, see WriteBehind.
+
         Parameters:
             user_id (int): The ID of the user.
             channel_id (int): The ID of the channel to add.
@@ -17,26 +19,4 @@ class Listener:
         Returns:
             bool: Whether the operation was successful.
         """
-        collection = self.db["Users"]
-        result = await collection.update_one(
-            filter={"_id": user_id},
-            update={"$addToSet": {"channels": channel_id}},
-            upsert=True,
-        )
-
-        return result.acknowledged
-
-    @alru_cache(maxsize=69, ttl=2)
-    async def user_requested_channels(self, user_id: int) -> list:
-        """
-        Fetches the list of channels for the user from the database.
-
-        Parameters:
-            user_id (int): The ID of the user.
-
-        Returns:
-            list: The list of private channel IDs the user is part of.
-        """
-        collection = self.db["Users"]
-        user_data = await collection.find_one({"_id": user_id}, {"_id": 0, "channels": 1})
-        return user_data.get("channels", []) if user_data else []
+        return await self.buffer_user_write(user_id=user_id, channel_id=channel_id)
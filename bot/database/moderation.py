@@ -1,10 +1,27 @@
-from async_lru import alru_cache
+import datetime
+from typing import ClassVar
+
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DESCENDING
 
 
 class Moderation:
+    """
+    Bans users, banned users are kept in an in-memory set so checking a ban needs no database call.
+
+    Every ban change stamps the user with a ban_updated server time, other instances pull the users
+    changed since the latest stamp they have seen with refresh_bans.
+
+    Attributes:
+        _banned_ids (ClassVar[set[int]]): Banned users, loaded on startup and kept in sync by ban/unban_user.
+        _bans_synced (ClassVar[datetime.datetime]): The latest ban_updated time applied to the ban set.
+    """
+
     db: AsyncIOMotorDatabase
 
+    _banned_ids: ClassVar[set[int]] = set()
+    _bans_synced: ClassVar[datetime.datetime] = datetime.datetime.fromtimestamp(0, tz=datetime.timezone.utc)
+
     async def ban_user(self, user_id: int) -> bool:
         """
         Bans a user in the database.
@@ -18,10 +35,12 @@ class Moderation:
         collection = self.db["Users"]
         result = await collection.update_one(
             filter={"_id": user_id},
-            update={"$set": {"_id": user_id, "banned": True}},
+            update={"$set": {"_id": user_id, "banned": True}, "$currentDate": {"ban_updated": True}},
             upsert=False,
         )
 
+        if result.matched_count:
+            self._banned_ids.add(user_id)
         return bool(result.matched_count)
 
     async def unban_user(self, user_id: int) -> bool:
@@ -37,15 +56,17 @@ class Moderation:
         collection = self.db["Users"]
         result = await collection.update_one(
             filter={"_id": user_id},
-            update={"$set": {"_id": user_id, "banned": False}},
+            update={"$set": {"_id": user_id, "banned": False}, "$currentDate": {"ban_updated": True}},
             upsert=False,
         )
+
+        if result.matched_count:
+            self._banned_ids.discard(user_id)
         return bool(result.matched_count)
 
-    @alru_cache(maxsize=69, ttl=15)
-    async def is_user_banned(self, user_id: int) -> bool:
+    def is_user_banned(self, user_id: int) -> bool:
         """
-        Checks if a user is banned in the database.
+        Checks if a user is banned.
 
         Parameters:
             user_id (int): The ID of the user to check.
@@ -53,7 +74,38 @@ class Moderation:
         Returns:
             bool: True if the user is banned, False otherwise.
         """
+        return user_id in self._banned_ids
+
+    async def load_bans(self) -> None:
+        """
+        Loads every banned user into the in-memory ban set.
+        """
         collection = self.db["Users"]
-        user = await collection.find_one({"_id": user_id}, {"_id": 0, "banned": 1})
+        latest = await collection.find_one(
+            {"ban_updated": {"$exists": True}},
+            {"_id": 0, "ban_updated": 1},
+            sort=[("ban_updated", DESCENDING)],
+        )
+        banned_ids = {user["_id"] async for user in collection.find({"banned": True}, {"_id": 1})}
+
+        Moderation._banned_ids = banned_ids
+        if latest:
+            Moderation._bans_synced = latest["ban_updated"].replace(tzinfo=datetime.timezone.utc)
 
-        return user.get("banned", False) if user else False
+    async def refresh_bans(self) -> None:
+        """
+        Applies the ban changes made by other instances since the latest change seen.
+
+        Changes stamped at the latest seen time are read again, which is harmless and covers changes
+        sharing the same millisecond.
+        """
+        async for user in self.db["Users"].find(
+            {"ban_updated": {"$gte": self._bans_synced}},
+            {"_id": 1, "banned": 1, "ban_updated": 1},
+        ):
+            if user.get("banned", False):
+                self._banned_ids.add(user["_id"])
+            else:
+                self._banned_ids.discard(user["_id"])
+            ban_updated = user["ban_updated"].replace(tzinfo=datetime.timezone.utc)
+            Moderation._bans_synced = max(self._bans_synced, ban_updated)
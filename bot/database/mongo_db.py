@@ -1,23 +1,43 @@
 import datetime
-import dns.resolver
-from async_lru import alru_cache
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import ConfigurationError
+from collections.abc import AsyncIterator
+from typing import ClassVar
+
+from motor.motor_asyncio import AsyncIOMotorCursor
+from pymongo import ASCENDING, ReturnDocument
 
 from bot.config import config
+from bot.utilities.helpers import AsyncTTLCache
 
+from .auto_delete import AutoDelete
+from .broadcasts import Broadcasts
+from .client_registry import MongoClientRegistry
+from .counters import Counters
+from .indexes import Indexes
 from .listener import Listener
 from .moderation import Moderation
 
 
-class MongoDB(Moderation, Listener):
+class MongoDB(Moderation, Listener, AutoDelete, Broadcasts, Indexes, Counters):
     """
     A class representing a MongoDB database connection.
 
+    Every instance shares the process-wide client from MongoClientRegistry.
+
     Parameters:
         name (str | None): The name of the database to connect to. Defaults to config.MONGO_DB_NAME.
+
+    Attributes:
+        link_cache (ClassVar[AsyncTTLCache]): Decoded link manifests shared by every instance.
+        _links_version (ClassVar[int]): The links version the link cache was filled from.
+        _admin_ids (ClassVar[set[int]]): Database admins, loaded on startup and kept in sync by add/remove_admin.
+        _admins_version (ClassVar[int]): The admins version the admin set was loaded from.
     """
 
+    link_cache: ClassVar[AsyncTTLCache] = AsyncTTLCache(maxsize=config.LINK_CACHE_SIZE, ttl=config.LINK_CACHE_SECONDS)
+    _links_version: ClassVar[int] = -1
+    _admin_ids: ClassVar[set[int]] = set()
+    _admins_version: ClassVar[int] = -1
+
     def __init__(self, name: str | None = None) -> None:
         """
         Initializes the MongoDB connection.
@@ -25,34 +45,34 @@ class MongoDB(Moderation, Listener):
         Raises:
             ConfigurationError: If the MongoDB connection configuration is invalid.
         """
-        try:
-            self.client = AsyncIOMotorClient(host=str(config.MONGO_DB_URL))
-        except ConfigurationError:
-            dns.resolver.default_resolver = dns.resolver.Resolver(configure=False)
-            dns.resolver.default_resolver.nameservers = ["8.8.8.8"]
-            self.client = AsyncIOMotorClient(host=str(config.MONGO_DB_URL))
+        self.client = MongoClientRegistry.get_client()
         self.db = self.client[name if name else config.MONGO_DB_NAME]
         self.grp = self.db.groups
         self.admins = self.db.admins
 
-    @alru_cache(maxsize=10, ttl=10)
-    async def add_user(self, user_id: int) -> bool:
+    async def upsert_user(self, user_id: int) -> dict:
         """
-        Adds a user to the database.
+        Adds a user to the database if missing and returns the user's stored state in the same round trip.
+
+        The write is not buffered like join requests, the start path needs the stored state right away.
 
         Parameters:
-            user_id (int): The ID of the user to add.
+            user_id (int): The ID of the user.
 
         Returns:
-            bool: Whether the user was added successfully.
+            dict: The user's banned and channels fields, empty if the user was added.
         """
-        collection = self.db["Users"]
-        result = await collection.update_one(
+        user_document = await self.db["Users"].find_one_and_update(
             filter={"_id": user_id},
-            update={"$set": {"_id": user_id}},
+            update={"$setOnInsert": {"joined": datetime.datetime.now(tz=datetime.timezone.utc)}},
+            projection={"_id": 0, "banned": 1, "channels": 1},
             upsert=True,
+            return_document=ReturnDocument.BEFORE,
         )
-        return result.acknowledged
+        if user_document is None:
+            await self.increment_counters(users=1)
+            return {}
+        return user_document
 
     async def add_file(self, file_link: str, file_origin: int, file_data: list[dict]) -> bool:
         """
@@ -77,6 +97,11 @@ class MongoDB(Moderation, Listener):
             },
             upsert=True,
         )
+        self.link_cache.invalidate(file_link)
+        # Only an overwritten link can be stale in the cache of another instance.
+        if result.matched_count:
+            await self.bump_links_version()
+        await self.increment_counters(links=1 if result.upserted_id is not None else 0)
         return result.acknowledged
 
     async def delete_link_document(self, base64_file_link: str) -> bool:
@@ -93,6 +118,10 @@ class MongoDB(Moderation, Listener):
         result = await collection.delete_one(
             filter={"_id": base64_file_link},
         )
+        self.link_cache.invalidate(base64_file_link)
+        if result.deleted_count:
+            await self.bump_links_version()
+        await self.increment_counters(links=-result.deleted_count)
         return result.deleted_count > 0
 
     async def get_link_document(self, base64_file_link: str) -> dict | None:
@@ -111,43 +140,110 @@ class MongoDB(Moderation, Listener):
         result = await collection.aggregate(pipeline).to_list(length=None)
         return result[0] if result else None
 
-    async def get_user_ids(self) -> tuple[list[int], list[int]]:
+    async def refresh_link_cache(self) -> None:
         """
-        Retrieves the IDs of all users in the database.
+        Clears the link cache if another instance added or deleted a link since it was filled.
+        """
+        version_doc = await self.db["BotSettings"].find_one({"_id": "LinksVersion"}, {"version": 1})
+        version = version_doc.get("version", 0) if version_doc else 0
+        if version != self._links_version:
+            self.link_cache.clear()
+            MongoDB._links_version = version
 
-        Returns:
-            tuple[list[int], list[int]]: A tuple containing two lists of user IDs.
+    async def bump_links_version(self) -> None:
+        """
+        Increases the links version so other instances clear their link cache.
+
+        The local link cache is cleared as well if another instance bumped the version in between.
+        """
+        version_doc = await self.db["BotSettings"].find_one_and_update(
+            {"_id": "LinksVersion"},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if version_doc["version"] != self._links_version + 1:
+            self.link_cache.clear()
+        MongoDB._links_version = version_doc["version"]
+
+    @staticmethod
+    async def next_user_id(cursor: AsyncIOMotorCursor) -> int | None:
         """
-        pipeline = [
-            {"$project": {"_id": 1}},
-            {"$group": {"_id": None, "user_ids": {"$addToSet": "$_id"}}},
-            {"$project": {"_id": 0, "user_ids": 1}},
-        ]
+        Returns the next user ID of a cursor, or None once it is exhausted.
+        """
+        try:
+            user = await cursor.next()
+        except StopAsyncIteration:
+            return None
+        return user["_id"]
+
+    async def iter_user_ids(
+        self,
+        batch_size: int | None = None,
+    ) -> AsyncIterator[tuple[int, bool, bool]]:
+        """
+        Streams the IDs of all users in the database, deduplicated across both user collections.
 
-        users_collection = self.db["Users"]
-        users_codex_collection = self.db["users"]
+        Both collections are read in _id order through the _id index and merged, so only one batch
+        of each is held in memory.
 
-        user_ids_cursor = users_collection.aggregate(pipeline)
-        user_ids = await user_ids_cursor.to_list(length=None)
+        Parameters:
+            batch_size (int | None): The amount of IDs fetched per batch. Defaults to config.BROADCAST_BATCH_SIZE.
 
-        user_ids_codex_cursor = users_codex_collection.aggregate(pipeline)
-        user_ids_codex = await user_ids_codex_cursor.to_list(length=None)
+        Yields:
+            tuple[int, bool, bool]: The user ID and whether it is stored in teleshare's and CodeXbotz's collection.
+        """
+        batch_size = batch_size if batch_size else config.BROADCAST_BATCH_SIZE
+        users_cursor = self.db["Users"].find({}, {"_id": 1}, sort=[("_id", ASCENDING)], batch_size=batch_size)
+        users_codex_cursor = self.db["users"].find({}, {"_id": 1}, sort=[("_id", ASCENDING)], batch_size=batch_size)
+
+        user_id = await self.next_user_id(users_cursor)
+        user_id_codex = await self.next_user_id(users_codex_cursor)
+
+        while user_id is not None or user_id_codex is not None:
+            if user_id_codex is None or (user_id is not None and user_id < user_id_codex):
+                yield user_id, True, False
+                user_id = await self.next_user_id(users_cursor)
+            elif user_id is None or user_id_codex < user_id:
+                yield user_id_codex, False, True
+                user_id_codex = await self.next_user_id(users_codex_cursor)
+            else:
+                yield user_id, True, True
+                user_id = await self.next_user_id(users_cursor)
+                user_id_codex = await self.next_user_id(users_codex_cursor)
+
+    async def iter_users_joined_after(
+        self,
+        joined: datetime.datetime,
+        batch_size: int | None = None,
+    ) -> AsyncIterator[int]:
+        """
+        Streams the IDs of users added to the database after a point in time.
 
-        main_ids = user_ids[0]["user_ids"] if user_ids else []
-        codex_ids = user_ids_codex[0]["user_ids"] if user_ids_codex else []
+        Parameters:
+            joined (datetime.datetime): Only users that joined after this time are streamed.
+            batch_size (int | None): The amount of IDs fetched per batch. Defaults to config.BROADCAST_BATCH_SIZE.
 
-        return (main_ids, codex_ids)
+        Yields:
+            int: The user ID, in joined order.
+        """
+        async for user in self.db["Users"].find(
+            {"joined": {"$gt": joined}},
+            {"_id": 1},
+            sort=[("joined", ASCENDING)],
+            batch_size=batch_size if batch_size else config.BROADCAST_BATCH_SIZE,
+        ):
+            yield user["_id"]
 
     async def stats(self) -> tuple[int, int]:
         """
-        Retrieves the number of links and users in the database.
+        Retrieves the number of links and users in the database from the counters document.
 
         Returns:
             tuple[int, int]: A tuple containing the number of links and users.
         """
-        link_count = await self.db["Files"].count_documents({})
-        users_count = await self.db["Users"].count_documents({})
-        return (link_count, users_count)
+        counters = await self.get_counters()
+        return (counters["links"], counters["users"])
 
     async def cleanup_users(self, unsuccessful_ids: list, unsuccessful_ids_codex: list) -> None:
         """
@@ -158,7 +254,8 @@ class MongoDB(Moderation, Listener):
             unsuccessful_ids_codex (list): List of user IDs to delete from the CodeXbotz database.
         """
         if unsuccessful_ids:
-            await self.db["Users"].delete_many({"_id": {"$in": unsuccessful_ids}})
+            result = await self.db["Users"].delete_many({"_id": {"$in": unsuccessful_ids}})
+            await self.increment_counters(users=-result.deleted_count)
 
         if unsuccessful_ids_codex:
             await self.db["users"].delete_many({"_id": {"$in": unsuccessful_ids_codex}})
@@ -188,6 +285,7 @@ class MongoDB(Moderation, Listener):
         """Add a new chat/group to database"""
         chat = self.new_group(chat, title)
         await self.grp.insert_one(chat)
+        await self.increment_counters(chats=1)
 
     async def get_chat(self, chat):
         """Get chat status from database"""
@@ -196,12 +294,13 @@ class MongoDB(Moderation, Listener):
     
     async def delete_chat(self, chat_id):
         """Delete a chat from database"""
-        await self.grp.delete_many({'id': int(chat_id)})
+        result = await self.grp.delete_many({'id': int(chat_id)})
+        await self.increment_counters(chats=-result.deleted_count)
     
     async def total_chat_count(self):
-        """Get total number of chats in database"""
-        count = await self.grp.count_documents({})
-        return count
+        """Get total number of chats from the counters document"""
+        counters = await self.get_counters()
+        return counters["chats"]
     
     async def get_all_chats(self):
         """Get all chats from database"""
@@ -227,30 +326,63 @@ class MongoDB(Moderation, Listener):
             "added_on": datetime.datetime.now()
         }
 
+    async def load_admins(self) -> None:
+        """Load every database admin into the in-memory admin set"""
+        version_doc = await self.db["BotSettings"].find_one({"_id": "AdminsVersion"}, {"version": 1})
+        admin_ids = {admin["id"] async for admin in self.admins.find({}, {"_id": 0, "id": 1})}
+        MongoDB._admin_ids = admin_ids
+        MongoDB._admins_version = version_doc.get("version", 0) if version_doc else 0
+
+    async def refresh_admins(self) -> None:
+        """Reload the admin set if another instance changed the admins"""
+        version_doc = await self.db["BotSettings"].find_one({"_id": "AdminsVersion"}, {"version": 1})
+        version = version_doc.get("version", 0) if version_doc else 0
+        if version != self._admins_version:
+            await self.load_admins()
+
+    async def bump_admins_version(self) -> None:
+        """Increase the admins version so other instances reload, reloading here too if another instance bumped it"""
+        version_doc = await self.db["BotSettings"].find_one_and_update(
+            {"_id": "AdminsVersion"},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if version_doc["version"] != self._admins_version + 1:
+            await self.load_admins()
+        else:
+            MongoDB._admins_version = version_doc["version"]
+
     async def add_admin(self, admin_id):
-        """Add a new admin to database"""
+        """Add a new admin to database, keyed on the admin ID so concurrent adds store one document"""
         admin_id = int(admin_id)
-        if not await self.is_admin(admin_id):
-            await self.admins.insert_one(self.new_admin(admin_id))
+        if admin_id in config.ROOT_ADMINS_ID:
+            return False
+        result = await self.admins.update_one(
+            {"id": admin_id},
+            {"$setOnInsert": self.new_admin(admin_id)},
+            upsert=True,
+        )
+        self._admin_ids.add(admin_id)
+        if result.upserted_id is not None:
+            await self.bump_admins_version()
             return True
         return False
 
     async def remove_admin(self, admin_id):
-        """Remove an admin from database"""
+        """Remove an admin from database, including duplicate documents stored by older versions"""
         admin_id = int(admin_id)
-        result = await self.admins.delete_one({"id": admin_id})
+        result = await self.admins.delete_many({"id": admin_id})
+        self._admin_ids.discard(admin_id)
+        if result.deleted_count > 0:
+            await self.bump_admins_version()
         return result.deleted_count > 0
 
-    async def is_admin(self, admin_id):
-        """Check if user is admin"""
+    def is_admin(self, admin_id):
+        """Check if user is admin using the in-memory admin set"""
         admin_id = int(admin_id)
-        if admin_id in config.ROOT_ADMINS_ID:
-            return True
-        admin = await self.admins.find_one({"id": admin_id})
-        return bool(admin)
+        return admin_id in config.ROOT_ADMINS_ID or admin_id in self._admin_ids
 
     async def get_all_admins(self):
-        """Get all admins from database"""
-        db_admins = [admin['id'] async for admin in self.admins.find({})]
-        all_admins = list(set(db_admins + config.ROOT_ADMINS_ID))
-        return all_admins
\ No newline at end of file
+        """Get all admins from the in-memory admin set"""
+        return list(self._admin_ids.union(config.ROOT_ADMINS_ID))
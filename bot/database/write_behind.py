@@ -0,0 +1,93 @@
+import datetime
+import logging
+from collections.abc import Awaitable, Callable
+from typing import ClassVar
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from bot.config import config
+
+
+class WriteBehind:
+    """
+    Buffers join request upserts and writes them to the Users collection in bulk.
+
+    Writes are deduplicated by user id and flushed once USER_WRITE_BATCH_SIZE users are pending,
+    every USER_WRITE_FLUSH_SECONDS by the schedule manager, and on shutdown. New users get a joined
+    time, which audience snapshots use to fetch only the users added since they were built. Users
+    opening the bot are registered by upsert_user instead, the start path needs their state at once.
+
+    Attributes:
+        _pending_channels (ClassVar[dict[int, set[int]]]): Join request channels waiting to be added per user.
+    """
+
+    db: AsyncIOMotorDatabase
+    increment_counters: Callable[..., Awaitable[None]]
+
+    logger = logging.getLogger(__name__)
+
+    _pending_channels: ClassVar[dict[int, set[int]]] = {}
+
+    async def buffer_user_write(self, user_id: int, channel_id: int) -> bool:
+        """
+        Queues a user upsert adding a join request channel to the user.
+
+        Parameters:
+            user_id (int): The ID of the user.
+            channel_id (int): The ID of a channel the user requested to join.
+
+        Returns:
+            bool: Whether the operation was successful, the write is only confirmed by the next flush.
+        """
+        WriteBehind._pending_channels.setdefault(user_id, set()).add(channel_id)
+
+        if len(self._pending_channels) >= config.USER_WRITE_BATCH_SIZE:
+            await self.flush_user_writes()
+        return True
+
+    def pending_user_channels(self, user_id: int) -> set[int]:
+        """
+        Returns the join request channels of a user that are not flushed yet.
+
+        Parameters:
+            user_id (int): The ID of the user.
+
+        Returns:
+            set[int]: The pending channel IDs.
+        """
+        return self._pending_channels.get(user_id, set())
+
+    async def flush_user_writes(self) -> None:
+        """
+        Writes every pending user upsert with a single unordered bulk_write.
+
+        The writes are put back into the buffer if the bulk_write fails, so the next flush retries them.
+        """
+        pending_channels, WriteBehind._pending_channels = self._pending_channels, {}
+
+        joined = datetime.datetime.now(tz=datetime.timezone.utc)
+        operations = [
+            UpdateOne(
+                filter={"_id": user_id},
+                update={
+                    "$addToSet": {"channels": {"$each": list(channel_ids)}},
+                    "$setOnInsert": {"joined": joined},
+                },
+                upsert=True,
+            )
+            for user_id, channel_ids in pending_channels.items()
+        ]
+        if not operations:
+            return
+
+        try:
+            result = await self.db["Users"].bulk_write(operations, ordered=False)
+        except PyMongoError:
+            self.logger.exception("Couldn't flush %d user writes, retrying on the next flush", len(operations))
+            for user_id, channel_ids in pending_channels.items():
+                WriteBehind._pending_channels.setdefault(user_id, set()).update(channel_ids)
+            return
+
+        await self.increment_counters(users=result.upserted_count)
@@ -1,7 +1,6 @@
 import asyncio
 import logging
 import sys
-import threading
 
 from pyrogram.client import Client
 from pyrogram.errors import ChannelInvalid, ChatAdminRequired
@@ -10,8 +9,10 @@ from rich.logging import RichHandler
 from rich.traceback import install
 
 from bot.config import config
+from bot.database import MongoClientRegistry, MongoDB
 from bot.options import options
-from bot.utilities.helpers import NoInviteLinkError, PyroHelper, RateLimiter
+from bot.utilities.broadcast_engine import broadcast_engine
+from bot.utilities.helpers import NoInviteLinkError, PyroHelper
 from bot.utilities.http_server import HTTPServer
 from bot.utilities.schedule_manager import schedule_manager
 
@@ -39,7 +40,14 @@ async def main() -> None:
     )
 
     # Load database settings
+    database = MongoDB()
+    await database.ensure_indexes()
+    await database.reconcile_counters()
+    if config.MONGO_QUERY_PLAN_CHECK:
+        await database.check_query_plans()
     await options.load_settings()
+    await database.load_admins()
+    await database.load_bans()
     await bot_client.start()
     # Bot setup
 
@@ -52,17 +60,19 @@ async def main() -> None:
     except (ChannelInvalid, ChatAdminRequired, NoInviteLinkError) as e:
         sys.exit(f"Please add and give me permission in FORCE_SUB_CHANNELS and BACKUP_CHANNEL:\n{e}")
 
-    await schedule_manager.start()
+    await schedule_manager.start(client=bot_client)
+    schedule_manager.schedule_interval(func=database.refresh_link_cache, seconds=config.LINK_CACHE_REFRESH_SECONDS)
+    schedule_manager.schedule_interval(func=database.refresh_admins, seconds=config.ADMINS_REFRESH_SECONDS)
+    schedule_manager.schedule_interval(func=database.refresh_bans, seconds=config.BANS_REFRESH_SECONDS)
+    schedule_manager.schedule_interval(func=database.reconcile_counters, seconds=config.COUNTERS_RECONCILE_SECONDS)
+    schedule_manager.schedule_interval(func=database.flush_user_writes, seconds=config.USER_WRITE_FLUSH_SECONDS)
+    await broadcast_engine.resume(client=bot_client)
 
     task = None
     if config.HTTP_SERVER:
         http_server = HTTPServer(host=config.HOSTNAME, port=config.PORT)
         task = asyncio.create_task(http_server.run_server())
         background_tasks.add(task)
-    if config.RATE_LIMITER:
-        thread = threading.Thread(target=RateLimiter.cooldown_limiter)
-        thread.daemon = True
-        thread.start()
 
     await idle()
 
@@ -70,6 +80,8 @@ async def main() -> None:
         task.add_done_callback(background_tasks.discard)
 
     await bot_client.stop()
+    await database.flush_user_writes()
+    MongoClientRegistry.close_all()
 
 
 asyncio.run(main())
@@ -16,11 +16,13 @@ database = MongoDB()
 
 
 @Client.on_message(
-    filters.private
-    & PyroFilters.admin(allow_global=True)
-    & PyroFilters.subscription()
-    & PyroFilters.user_not_in_conversation()
-    & (filters.audio | filters.photo | filters.video | filters.document | filters.sticker),
+    PyroFilters.ordered(
+        filters.private,
+        PyroFilters.admin(allow_global=True),
+        PyroFilters.subscription(),
+        PyroFilters.user_not_in_conversation(),
+        filters.audio | filters.photo | filters.video | filters.document | filters.sticker,
+    ),
 )
 @RateLimiter.hybrid_limiter(func_count=1)
 async def auto_link_gen(client: Client, message: ConvoMessage) -> Message | None:
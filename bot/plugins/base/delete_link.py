@@ -8,7 +8,7 @@ from bot.config import config
 from bot.database import MongoDB
 from bot.utilities.helpers import RateLimiter
 from bot.utilities.pyrofilters import PyroFilters
-from bot.utilities.pyrotools import FileResolverModel, HelpCmd
+from bot.utilities.pyrotools import HelpCmd, LinkManifest
 
 database = MongoDB()
 
@@ -27,21 +27,20 @@ async def delete_link(client: Client, message: Message) -> Message:
         return await message.reply(text=cleandoc(delete_link.__doc__ or ""), quote=True)
 
     base64_file_link = message.text.split("start=")[1]
-    file_document = await database.get_link_document(base64_file_link=base64_file_link)
+    link_manifest = await LinkManifest.resolve(database=database, base64_file_link=base64_file_link)
 
-    if not file_document:
+    if not link_manifest:
         return await message.reply(
             text="Cannot find link: Either it has been deleted or it does not exist.",
             quote=True,
         )
 
-    file_origin = file_document["file_origin"]
-    file_data = [FileResolverModel(**file) for file in file_document["files"]]
+    file_origin = link_manifest.file_origin
 
     delete_link_document = await database.delete_link_document(base64_file_link=base64_file_link)
 
     if file_origin == config.BACKUP_CHANNEL and delete_link_document:
-        message_ids = [i.message_id for i in file_data]
+        message_ids = [i.message_id for i in link_manifest.files]
         await client.delete_messages(chat_id=file_origin, message_ids=message_ids)
 
     return await message.reply(text=f">**Successfully Deleted:**\n `{base64_file_link}`", quote=True)
@@ -10,6 +10,7 @@ from bot.config import config
 from bot.database import MongoDB
 from bot.options import options
 from bot.utilities.helpers import DataEncoder, RateLimiter
+from bot.utilities.helpers.send_scheduler import send_scheduler
 from bot.utilities.pyrofilters import ConvoMessage, PyroFilters
 from bot.utilities.pyrotools import HelpCmd
 from bot.utilities.helpers.weblink import get_web_link
@@ -42,7 +43,7 @@ class MakeFilesCommand:
         Returns:
             Message: The replied message.
         """
-        return await message.reply(**kwargs)
+        return await send_scheduler.send(message.chat.id, message.reply, **kwargs)
 
     @classmethod
     async def handle_convo_start(cls, client: Client, message: ConvoMessage) -> Message:
@@ -145,7 +146,9 @@ class MakeFilesCommand:
         files_to_store = []
         if options.settings.BACKUP_FILES:
             for user_cache in user_cache_chunk:
-                forwarded_messages = await client.forward_messages(
+                forwarded_messages = await send_scheduler.send(
+                    config.BACKUP_CHANNEL,
+                    client.forward_messages,
                     chat_id=config.BACKUP_CHANNEL,
                     from_chat_id=message.chat.id,
                     message_ids=user_cache,
@@ -194,12 +197,14 @@ class MakeFilesCommand:
 
 
 @Client.on_message(
-    filters.private
-    & PyroFilters.admin(allow_global=True)
-    & PyroFilters.subscription()
-    & PyroFilters.create_conversation_filter(
-        convo_start=["/make_files", "/batch", "/batch_files"],
-        convo_stop=["/make_link", "/batch_link"],
+    PyroFilters.ordered(
+        filters.private,
+        PyroFilters.admin(allow_global=True),
+        PyroFilters.subscription(),
+        PyroFilters.create_conversation_filter(
+            convo_start=["/make_files", "/batch", "/batch_files"],
+            convo_stop=["/make_link", "/batch_link"],
+        ),
     ),
 )
 async def make_files_command_handler(client: Client, message: ConvoMessage) -> Message | None:
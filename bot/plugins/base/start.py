@@ -1,23 +1,96 @@
+import asyncio
+import functools
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
 from pyrogram import filters
 from pyrogram.client import Client
+from pyrogram.errors import BadRequest, RPCError
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
 
 from bot.config import config
 from bot.database import MongoDB
 from bot.options import options
 from bot.utilities.helpers import DataEncoder, DataValidationError, PyroHelper, RateLimiter
+from bot.utilities.helpers.delivery_registry import delivery_registry
+from bot.utilities.helpers.delivery_scheduler import delivery_scheduler
+from bot.utilities.helpers.send_scheduler import send_scheduler
 from bot.utilities.pyrofilters import PyroFilters, SubscriptionMessage
-from bot.utilities.pyrotools import FileResolverModel, HelpCmd, Pyrotools
+from bot.utilities.pyrotools import FileResolverModel, HelpCmd, LinkManifest, Pyrotools, UserState
 from bot.utilities.schedule_manager import schedule_manager
 
 database = MongoDB()
 
+T = TypeVar("T")
+
 
 class FileSender:
     """Used to manage file sending functions between codexbotz and teleshare."""
 
+    logger = logging.getLogger(__name__)
+
     forward_limit_size = 100
 
+    @classmethod
+    async def deliver_chunks(
+        cls,
+        chat_id: int,
+        chunks: list[list[T]],
+        send_chunk: Callable[[list[T]], Awaitable[Message | list[Message]]],
+    ) -> tuple[list[Message], bool]:
+        """
+        Delivers chunks through the fair delivery scheduler, one chunk per slice.
+
+        The scheduler has at most one slice of a user in flight, so the chunks reach the chat one after
+        another in chunk order, interleaved with the deliveries of other users. Chunks are not pipelined:
+        telegram doesn't order concurrent requests to the same chat, and a chunk has nothing to resolve
+        ahead of its send, a forward or album is a single request built from the stored IDs.
+
+        A chunk that failed with an error other than a BadRequest is retried up to DELIVERY_CHUNK_RETRIES
+        times, send_chunk must only raise if nothing of the chunk was sent so a retry never sends a file twice.
+
+        Parameters:
+            chat_id (int): The chat the chunks are delivered to.
+            chunks (list[list[T]]): The chunks to deliver.
+            send_chunk (Callable[[list[T]], Awaitable[Message | list[Message]]]): Sends a single chunk.
+
+        Returns:
+            tuple[list[Message], bool]: The sent messages in chunk order, and whether every chunk was sent.
+        """
+        failed_chunks = 0
+
+        async def deliver_chunk(chunk_number: int, chunk: list[T]) -> list[Message]:
+            nonlocal failed_chunks
+            for attempt in range(1, config.DELIVERY_CHUNK_RETRIES + 2):
+                started = time.perf_counter()
+                try:
+                    send_files = await send_chunk(chunk)
+                except RPCError as e:
+                    if isinstance(e, BadRequest) or attempt > config.DELIVERY_CHUNK_RETRIES:
+                        cls.logger.exception("Chunk %d failed, chat: %d", chunk_number, chat_id)
+                        failed_chunks += 1
+                        return []
+                    continue
+
+                cls.logger.info(
+                    "Chunk %d/%d delivered in %.2f seconds, chat: %d",
+                    chunk_number,
+                    len(chunks),
+                    time.perf_counter() - started,
+                    chat_id,
+                )
+                return send_files if isinstance(send_files, list) else [send_files]
+            return []
+
+        slices = [
+            (len(chunk), functools.partial(deliver_chunk, chunk_number, chunk))
+            for chunk_number, chunk in enumerate(chunks, start=1)
+        ]
+        send_files = await delivery_scheduler.submit(user_id=chat_id, slices=slices)
+        return send_files, not failed_chunks
+
     @staticmethod
     async def codexbotz(
         client: Client,
@@ -25,36 +98,38 @@ class FileSender:
         chat_id: int,
         from_chat_id: int,
         protect_content: bool,  # noqa: FBT001
-    ) -> list[Message]:
-        all_sent_files = []
-
+    ) -> tuple[list[Message], bool]:
         if len(codex_message_ids) == 1:
-            send_files = await client.copy_message(
-                chat_id=chat_id,
-                from_chat_id=from_chat_id,
-                message_id=codex_message_ids[0],
-                protect_content=protect_content,
-            )
 
-            all_sent_files.append(send_files)
+            async def send_chunk(codex_files: list[int]) -> Message | list[Message]:
+                return await send_scheduler.send(
+                    chat_id,
+                    client.copy_message,
+                    chat_id=chat_id,
+                    from_chat_id=from_chat_id,
+                    message_id=codex_files[0],
+                    protect_content=protect_content,
+                )
 
         else:
-            codex_message_ids_chunk = [
-                codex_message_ids[i : i + FileSender.forward_limit_size]
-                for i in range(0, len(codex_message_ids), FileSender.forward_limit_size)
-            ]
 
-            for codex_files in codex_message_ids_chunk:
-                send_files = await client.forward_messages(
+            async def send_chunk(codex_files: list[int]) -> Message | list[Message]:
+                return await send_scheduler.send(
+                    chat_id,
+                    client.forward_messages,
                     chat_id=chat_id,
                     from_chat_id=from_chat_id,
                     message_ids=codex_files,
                     hide_sender_name=True,
                     protect_content=protect_content,
                 )
-                all_sent_files.extend(send_files) if isinstance(send_files, list) else all_sent_files.append(send_files)
 
-        return all_sent_files
+        codex_message_ids_chunk = [
+            codex_message_ids[i : i + FileSender.forward_limit_size]
+            for i in range(0, len(codex_message_ids), FileSender.forward_limit_size)
+        ]
+        # Deleted backup messages are skipped by telegram, so only failed chunks make the delivery incomplete.
+        return await FileSender.deliver_chunks(chat_id=chat_id, chunks=codex_message_ids_chunk, send_chunk=send_chunk)
 
     @staticmethod
     async def teleshare(
@@ -63,34 +138,136 @@ class FileSender:
         file_data: list[FileResolverModel],
         file_origin: int,
         protect_content: bool,  # noqa: FBT001
-    ) -> list[Message]:
-        all_sent_files = []
-
+    ) -> tuple[list[Message], bool]:
         if len(file_data) == 1:
-            send_files = await Pyrotools.send_media(
-                client=client,
-                chat_id=chat_id,
-                file_data=file_data[0],
-                file_origin=file_origin,
-                protect_content=protect_content,
-            )
-            all_sent_files.append(send_files)
+
+            async def send_chunk(i_file_data: list[FileResolverModel]) -> Message | list[Message]:
+                return await Pyrotools.send_media(
+                    client=client,
+                    chat_id=chat_id,
+                    file_data=i_file_data[0],
+                    file_origin=file_origin,
+                    protect_content=protect_content,
+                )
+
         else:
-            file_data_chunk = [
-                file_data[i : i + FileSender.forward_limit_size]
-                for i in range(0, len(file_data), FileSender.forward_limit_size)
-            ]
 
-            for i_file_data in file_data_chunk:
-                send_files = await Pyrotools.send_media_group(
+            async def send_chunk(i_file_data: list[FileResolverModel]) -> Message | list[Message]:
+                return await Pyrotools.send_media_group(
                     client=client,
                     chat_id=chat_id,
                     file_data=i_file_data,
                     file_origin=file_origin,
                     protect_content=protect_content,
                 )
-                all_sent_files.extend(send_files) if isinstance(send_files, list) else all_sent_files.append(send_files)
-        return all_sent_files
+
+        file_data_chunk = [
+            file_data[i : i + FileSender.forward_limit_size]
+            for i in range(0, len(file_data), FileSender.forward_limit_size)
+        ]
+        send_files, complete = await FileSender.deliver_chunks(
+            chat_id=chat_id,
+            chunks=file_data_chunk,
+            send_chunk=send_chunk,
+        )
+        # send_media_group skips files it couldn't send, every stored file is expected to arrive.
+        return send_files, complete and len(send_files) == len(file_data)
+
+    @classmethod
+    def delivery_done(cls, task: asyncio.Task, user_id: int, link: str) -> None:
+        """
+        Logs a delivery that failed with an exception and releases its registry entry, so the user can retry.
+
+        Parameters:
+            task (asyncio.Task): The finished delivery task.
+            user_id (int): The user the link was delivered to.
+            link (str): The requested link.
+        """
+        if task.cancelled():
+            delivery_registry.release(user_id=user_id, link=link)
+            return
+
+        exception = task.exception()
+        if exception is not None:
+            cls.logger.error("Delivery failed, user: %d", user_id, exc_info=exception)
+            delivery_registry.release(user_id=user_id, link=link)
+
+    @classmethod
+    async def deliver_link(cls, client: Client, message: Message, base64_file_link: str) -> bool:
+        """
+        Delivers the files of a link and schedules their auto deletion.
+
+        Parameters:
+            client (Client): The Pyrogram client.
+            message (Message): The start message that requested the link.
+            base64_file_link (str): The requested link.
+
+        Returns:
+            bool: True if every file was delivered, False if the link is invalid, its files do not exist or some
+                files couldn't be sent.
+        """
+        link_manifest = await LinkManifest.resolve(database=database, base64_file_link=base64_file_link)
+
+        if not link_manifest:
+            try:
+                codex_message_ids = DataEncoder.codex_decode(
+                    base64_string=base64_file_link,
+                    backup_channel=config.BACKUP_CHANNEL,
+                )
+            except (DataValidationError, IndexError):
+                await message.reply(text="Attempted to resolve link: Got invalid link.")
+                return False
+
+            send_files, complete = await cls.codexbotz(
+                client=client,
+                codex_message_ids=codex_message_ids,
+                chat_id=message.chat.id,
+                from_chat_id=config.BACKUP_CHANNEL,
+                protect_content=config.PROTECT_CONTENT,
+            )
+            if not send_files and complete:
+                await message.reply(text="Attempted to fetch files: Does not exist.")
+                return False
+        else:
+            send_files, complete = await cls.teleshare(
+                client=client,
+                chat_id=message.chat.id,
+                file_data=link_manifest.files,
+                file_origin=link_manifest.file_origin,
+                protect_content=config.PROTECT_CONTENT,
+            )
+
+        if not send_files:
+            await message.reply(text="Attempted to send files: Failed, please try the link again.")
+            return False
+
+        delete_n_seconds = options.settings.AUTO_DELETE_SECONDS
+
+        if delete_n_seconds != 0:
+            schedule_delete_message = [msg.id for msg in send_files]
+
+            auto_delete_message = (
+                options.settings.AUTO_DELETE_MESSAGE.format(int(delete_n_seconds / 60))
+                if not isinstance(options.settings.AUTO_DELETE_MESSAGE, int)
+                else options.settings.AUTO_DELETE_MESSAGE
+            )
+            auto_delete_message_reply = await PyroHelper.option_message(
+                client=client,
+                message=message,
+                option_key=auto_delete_message,
+            )
+            schedule_delete_message.append(auto_delete_message_reply.id)
+
+            await schedule_manager.schedule_delete(
+                client=client,
+                chat_id=message.chat.id,
+                message_ids=schedule_delete_message,
+                delete_n_seconds=delete_n_seconds,
+            )
+
+        if not complete:
+            await message.reply(text="Attempted to send files: Some files failed, please try the link again.")
+        return complete
 
 
 @Client.on_message(
@@ -112,67 +289,31 @@ async def file_start(
         await PyroHelper.option_message(client=client, message=message, option_key=options.settings.START_MESSAGE)
         return message.stop_propagation()
 
-    # shouldn't overwrite existing id it already exists
-    await database.add_user(user_id=message.from_user.id)
+    # Registers the user, the state is shared with the filters that already loaded it.
+    await UserState.load(database=database, message=message)
 
     base64_file_link = message.text.split(maxsplit=1)[1]
-    file_document = await database.get_link_document(base64_file_link=base64_file_link)
-
-    if not file_document:
-        try:
-            codex_message_ids = DataEncoder.codex_decode(
-                base64_string=base64_file_link,
-                backup_channel=config.BACKUP_CHANNEL,
-            )
-        except (DataValidationError, IndexError):
-            await message.reply(text="Attempted to resolve link: Got invalid link.")
-            return message.stop_propagation()
-
-        send_files = await FileSender.codexbotz(
-            client=client,
-            codex_message_ids=codex_message_ids,
-            chat_id=message.chat.id,
-            from_chat_id=config.BACKUP_CHANNEL,
-            protect_content=config.PROTECT_CONTENT,
-        )
-        if not send_files:
-            await message.reply(text="Attempted to fetch files: Does not exist.")
-            return message.stop_propagation()
-    else:
-        file_origin = file_document["file_origin"]
-        file_data = [FileResolverModel(**file) for file in file_document["files"]]
-
-        send_files = await FileSender.teleshare(
-            client=client,
-            chat_id=message.chat.id,
-            file_data=file_data,
-            file_origin=file_origin,
-            protect_content=config.PROTECT_CONTENT,
-        )
 
+    # Auto deleted files aren't in the chat anymore, a tap after that is delivered again.
     delete_n_seconds = options.settings.AUTO_DELETE_SECONDS
-
+    dedupe_seconds = config.DELIVERY_DEDUPE_SECONDS
     if delete_n_seconds != 0:
-        schedule_delete_message = [msg.id for msg in send_files]
-
-        auto_delete_message = (
-            options.settings.AUTO_DELETE_MESSAGE.format(int(delete_n_seconds / 60))
-            if not isinstance(options.settings.AUTO_DELETE_MESSAGE, int)
-            else options.settings.AUTO_DELETE_MESSAGE
-        )
-        auto_delete_message_reply = await PyroHelper.option_message(
-            client=client,
-            message=message,
-            option_key=auto_delete_message,
-        )
-        schedule_delete_message.append(auto_delete_message_reply.id)
-
-        await schedule_manager.schedule_delete(
-            client=client,
-            chat_id=message.chat.id,
-            message_ids=schedule_delete_message,
-            delete_n_seconds=delete_n_seconds,
-        )
+        dedupe_seconds = min(dedupe_seconds, delete_n_seconds)
+
+    async def deliver() -> None:
+        if not await delivery_registry.run(
+            user_id=message.from_user.id,
+            link=base64_file_link,
+            deliver=lambda: FileSender.deliver_link(client=client, message=message, base64_file_link=base64_file_link),
+            window=dedupe_seconds,
+        ):
+            await message.reply(text="Attempted to send files: Already delivered, check the files above.")
+
+    # The delivery is queued in the fair scheduler, so this worker is free for other updates meanwhile.
+    delivery_task = delivery_scheduler.run_in_background(deliver())
+    delivery_task.add_done_callback(
+        functools.partial(FileSender.delivery_done, user_id=message.from_user.id, link=base64_file_link),
+    )
     return message.stop_propagation()
 
 
@@ -186,7 +327,8 @@ async def return_start(
     Handle start command without files or not subscribed.
     """
 
-    if hasattr(message, "user_is_banned") and message.user_is_banned:
+    user_state = getattr(message, "user_state", None)
+    if (hasattr(message, "user_is_banned") and message.user_is_banned) or (user_state and user_state.banned):
         return await PyroHelper.option_message(
             client=client,
             message=message,
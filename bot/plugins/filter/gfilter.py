@@ -6,6 +6,7 @@ from pyrogram import errors
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
 from bot.database import MongoDB
 from bot.config import config
+from bot.utilities.helpers.send_scheduler import send_scheduler
 
 db = MongoDB()
 
@@ -112,7 +113,9 @@ async def search_channels(bot: Client, message: Message):
            ]]
            text = f"<b><a href='{channel['link']}'>{channel['title']}</a></b>"
 
-           await message.reply_text(
+           await send_scheduler.send(
+               message.chat.id,
+               message.reply_text,
                text=text,
                reply_markup=InlineKeyboardMarkup(buttons),
                disable_web_page_preview=True
@@ -0,0 +1,28 @@
+from pyrogram import filters
+from pyrogram.client import Client
+from pyrogram.types import ChatMemberUpdated
+
+from bot.config import config
+from bot.utilities.pyrofilters import PyroFilters
+
+force_sub_channels = filters.create(
+    lambda _, __, chat_member_updated: chat_member_updated.chat.id in config.FORCE_SUB_CHANNELS,
+    "ForceSubChannelsFilter",
+)
+
+
+@Client.on_chat_member_updated(force_sub_channels, group=1)
+async def force_sub_member_updated(client: Client, chat_member_updated: ChatMemberUpdated) -> None:  # noqa: ARG001
+    """Keep the subscription cache in sync with joins and leaves of the force-sub channels."""
+    chat_member = chat_member_updated.new_chat_member or chat_member_updated.old_chat_member
+    if not chat_member or not chat_member.user:
+        return
+
+    user_id = chat_member.user.id
+    channel_id = chat_member_updated.chat.id
+    new_chat_member = chat_member_updated.new_chat_member
+
+    if new_chat_member and new_chat_member.status in PyroFilters.MEMBER_STATUS:
+        PyroFilters.mark_member(user_id=user_id, channel_id=channel_id)
+    else:
+        PyroFilters.forget_member(user_id=user_id, channel_id=channel_id)
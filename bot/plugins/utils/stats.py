@@ -4,7 +4,10 @@ from pyrogram.types import Message
 
 from bot.database import MongoDB
 from bot.utilities.helpers import RateLimiter
-from bot.utilities.pyrofilters import PyroFilters
+from bot.utilities.helpers.delivery_registry import delivery_registry
+from bot.utilities.helpers.delivery_scheduler import delivery_scheduler
+from bot.utilities.helpers.send_scheduler import send_scheduler
+from bot.utilities.pyrofilters import PyroFilters, UpdateContext
 from bot.utilities.pyrotools import HelpCmd
 
 database = MongoDB()
@@ -23,12 +26,32 @@ async def stats(_: Client, message: Message) -> Message:
 
     link_count, users_count = await database.stats()
     chats = await database.total_chat_count()
+    link_cache_hit_rate = database.link_cache.hit_rate * 100
+    rate_limiter_stats = RateLimiter.stats()
+    send_stats = send_scheduler.stats()
+    delivery_stats = delivery_registry.stats()
+    latency_stats = delivery_scheduler.stats()
+    filter_costs = "".join(
+        f"\n**Filter {name.capitalize()}:** `{milliseconds:.2f}ms`"
+        for name, milliseconds in UpdateContext.stats().items()
+    )
 
     return await message.reply(
         f"> STATS:\n"
         f"**Users Count:** `{users_count}`\n"
         f"**Links Count:** `{link_count}`\n"
-        f"**Total Chats:** `{chats}`"
+        f"**Total Chats:** `{chats}`\n"
+        f"**Link Cache Hit Rate:** `{link_cache_hit_rate:.1f}%`\n"
+        f"**Deferred Updates:** `{rate_limiter_stats['deferred']}`\n"
+        f"**Dropped Updates:** `{rate_limiter_stats['dropped']}`\n"
+        f"**Send Rate:** `{send_stats['global_rate']:.1f}/s`\n"
+        f"**Flood Waits:** `{send_stats['flood_waits']}`\n"
+        f"**Duplicate Deliveries Skipped:** "
+        f"`{delivery_stats['skipped_concurrent'] + delivery_stats['skipped_recent']}`\n"
+        f"**Waiting Deliveries:** `{latency_stats['waiting']}`\n"
+        f"**Small Delivery p50/p99:** `{latency_stats['small_p50']:.2f}s / {latency_stats['small_p99']:.2f}s`\n"
+        f"**Large Delivery p50/p99:** `{latency_stats['large_p50']:.2f}s / {latency_stats['large_p99']:.2f}s`"
+        f"{filter_costs}"
     )
 
 
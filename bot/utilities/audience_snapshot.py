@@ -0,0 +1,185 @@
+import asyncio
+import bisect
+import contextlib
+import datetime
+import logging
+import mmap
+import struct
+from array import array
+from collections.abc import Iterator
+from pathlib import Path
+
+from bot.config import config
+from bot.database import MongoDB
+
+database = MongoDB()
+
+
+class AudienceSnapshot:
+    """
+    Snapshots the deduplicated broadcast audience into a compact int64 file that is memory-mapped.
+
+    The file is a header followed by user IDs as native int64. The first base_count IDs are the sorted
+    audience streamed from both user collections, users that joined afterwards are appended by later
+    deltas, so an offset into a snapshot always points at the same user and is all a broadcast needs to
+    resume. A snapshot older than max_age is replaced by a new full snapshot on the next broadcast.
+
+    Parameters:
+        directory (str): The directory snapshots are stored in.
+        max_age (int): The amount of seconds a snapshot is refreshed with deltas before it is rebuilt.
+    """
+
+    MAGIC = b"AUDSNAP1"
+    HEADER = struct.Struct("<8sdq")
+
+    def __init__(self, directory: str, max_age: int) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.directory = Path(directory)
+        self.max_age = max_age
+        self._lock = asyncio.Lock()
+
+    def read_header(self, path: Path) -> tuple[float, int]:
+        """
+        Reads the header of a snapshot.
+
+        Parameters:
+            path (Path): The snapshot path.
+
+        Returns:
+            tuple[float, int]: The timestamp the snapshot is up to date with and its sorted base count.
+        """
+        with path.open("rb") as f:
+            magic, created, base_count = self.HEADER.unpack(f.read(self.HEADER.size))
+        if magic != self.MAGIC:
+            msg = f"{path} is not an audience snapshot"
+            raise ValueError(msg)
+        return created, base_count
+
+    @contextlib.contextmanager
+    def open(self, path: str) -> Iterator[memoryview]:
+        """
+        Memory-maps a snapshot.
+
+        Parameters:
+            path (str): The snapshot path.
+
+        Yields:
+            memoryview: The user IDs of the snapshot as int64, it can be sliced by offset.
+        """
+        with Path(path).open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)[self.HEADER.size :].cast("q")
+            try:
+                yield view
+            finally:
+                view.release()
+
+    def position_after(self, path: str, user_id: int) -> int:
+        """
+        Finds the offset right after a user, used to resume a broadcast on a rebuilt snapshot.
+
+        A user missing from the snapshot, e.g. removed as unreachable, is placed where it would be sorted
+        into the base. Users that joined while the broadcast ran can be ordered differently in the rebuilt
+        snapshot, so some of them may be repeated or skipped.
+
+        Parameters:
+            path (str): The snapshot path.
+            user_id (int): The last handled user.
+
+        Returns:
+            int: The offset of the first user after the given user.
+        """
+        _, base_count = self.read_header(Path(path))
+        with self.open(path) as snapshot_ids:
+            appended_ids = snapshot_ids[base_count:].tolist()
+            if user_id in appended_ids:
+                return base_count + appended_ids.index(user_id) + 1
+            return bisect.bisect_right(snapshot_ids, user_id, 0, base_count)
+
+    async def prepare(self, keep: set[str]) -> str:
+        """
+        Returns an up to date snapshot, applying a delta to the latest one or building a new one.
+
+        Parameters:
+            keep (set[str]): Snapshots still used by running broadcasts, they are not removed.
+
+        Returns:
+            str: The snapshot path.
+        """
+        async with self._lock:
+            snapshots = sorted(self.directory.glob("audience-*.snapshot"))
+            now = datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
+
+            if snapshots and now - int(snapshots[-1].stem.split("-")[1]) < self.max_age:
+                await self.apply_delta(path=snapshots[-1])
+                return str(snapshots[-1])
+
+            path = await self.build()
+            for snapshot in snapshots:
+                if str(snapshot) not in keep:
+                    snapshot.unlink(missing_ok=True)
+            return str(path)
+
+    async def build(self) -> Path:
+        """
+        Streams the whole audience into a new snapshot.
+
+        Returns:
+            Path: The snapshot path.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        created = datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
+        path = self.directory / f"audience-{int(created)}.snapshot"
+        temp_path = path.with_suffix(".tmp")
+
+        base_count = 0
+        with temp_path.open("wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, created, 0))
+            user_ids = array("q")
+            async for user_id, _, _ in database.iter_user_ids():
+                user_ids.append(user_id)
+                if len(user_ids) >= config.BROADCAST_BATCH_SIZE:
+                    user_ids.tofile(f)
+                    base_count += len(user_ids)
+                    user_ids = array("q")
+            user_ids.tofile(f)
+            base_count += len(user_ids)
+
+            f.seek(0)
+            f.write(self.HEADER.pack(self.MAGIC, created, base_count))
+
+        temp_path.replace(path)
+        self.logger.info("Audience snapshot %s built with %d users", path, base_count)
+        return path
+
+    async def apply_delta(self, path: Path) -> None:
+        """
+        Appends the users that joined since the snapshot was last updated.
+
+        Parameters:
+            path (Path): The snapshot path.
+        """
+        created, base_count = self.read_header(path)
+        updated = datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
+        joined = datetime.datetime.fromtimestamp(created, tz=datetime.timezone.utc)
+
+        with self.open(str(path)) as snapshot_ids:
+            appended_ids = set(snapshot_ids[base_count:].tolist())
+            new_user_ids = array("q")
+            async for user_id in database.iter_users_joined_after(joined=joined):
+                # A user of the legacy collection can join later and already be part of the base.
+                position = bisect.bisect_left(snapshot_ids, user_id, 0, base_count)
+                in_base = position < base_count and snapshot_ids[position] == user_id
+                if not in_base and user_id not in appended_ids:
+                    appended_ids.add(user_id)
+                    new_user_ids.append(user_id)
+
+        with path.open("r+b") as f:
+            f.seek(0, 2)
+            new_user_ids.tofile(f)
+            f.seek(0)
+            f.write(self.HEADER.pack(self.MAGIC, updated, base_count))
+
+        self.logger.info("Audience snapshot %s updated with %d new users", path, len(new_user_ids))
+
+
+audience_snapshot = AudienceSnapshot(directory=config.BROADCAST_SNAPSHOT_DIR, max_age=config.BROADCAST_SNAPSHOT_MAX_AGE)
@@ -0,0 +1,299 @@
+import asyncio
+import contextlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pyrogram.client import Client
+from pyrogram.errors import InputUserDeactivated, PeerIdInvalid, RPCError, UserIsBlocked, UserIsBot
+from pyrogram.types import Message
+
+from bot.config import config
+from bot.database import MongoDB
+from bot.utilities.audience_snapshot import audience_snapshot
+from bot.utilities.helpers import SendPriority
+from bot.utilities.helpers.send_scheduler import send_scheduler
+
+if TYPE_CHECKING:
+    from bson import ObjectId
+
+database = MongoDB()
+
+
+class BroadcastProgress:
+    """
+    The progress of a running broadcast.
+
+    Users are dispatched in snapshot order, position is the snapshot offset every user before has
+    been handled, so a resumed broadcast skips no one and repeats at most the users that were in flight.
+    last_user_id is the user right before position, it locates the position again in a rebuilt snapshot.
+    """
+
+    __slots__ = ("dead_ids", "in_flight", "last_user_id", "position", "successful", "unsuccessful")
+
+    def __init__(self, broadcast: dict) -> None:
+        self.position: int = broadcast["position"]
+        self.last_user_id: int | None = broadcast.get("last_user_id")
+        self.successful: int = broadcast["successful"]
+        self.unsuccessful: int = broadcast["unsuccessful"]
+        self.in_flight: OrderedDict[int, int | None] = OrderedDict()
+        self.dead_ids: list[int] = []
+
+    def dispatch(self, offset: int) -> None:
+        """
+        Marks the user at a snapshot offset as in flight.
+        """
+        self.in_flight[offset] = None
+
+    def handled(self, offset: int, user_id: int) -> None:
+        """
+        Marks the user at a snapshot offset as handled and advances the position past every handled user in front.
+        """
+        self.in_flight[offset] = user_id
+        while self.in_flight and next(iter(self.in_flight.values())) is not None:
+            handled_offset, self.last_user_id = self.in_flight.popitem(last=False)
+            self.position = handled_offset + 1
+
+
+class BroadcastEngine:
+    """
+    Sends broadcasts with a pool of concurrent senders under the send scheduler's global budget.
+
+    The audience is read from a memory-mapped audience snapshot into a bounded queue consumed by
+    config.BROADCAST_CONCURRENCY senders. Every config.BROADCAST_CHECKPOINT_SECONDS unreachable users
+    are removed with cleanup_users, the progress is checkpointed to the Broadcasts collection and the
+    progress message is edited. Broadcasts still running on startup are resumed from their checkpoint.
+    """
+
+    DEAD_USER_ERRORS = (UserIsBlocked, InputUserDeactivated, PeerIdInvalid, UserIsBot)
+
+    def __init__(self) -> None:
+        self.logger = logging.getLogger(__name__)
+        self._cancelled: dict[ObjectId, asyncio.Event] = {}
+        self._snapshots: dict[ObjectId, str] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def start(self, client: Client, message: Message, pin: bool) -> Message:  # noqa: FBT001
+        """
+        Starts broadcasting the message the command replied to.
+
+        Parameters:
+            client (Client): The Pyrogram client instance.
+            message (Message): The broadcast command message, replying to the message to broadcast.
+            pin (bool): Whether to pin the broadcasted message.
+
+        Returns:
+            Message: The progress message.
+        """
+        notice_message = await message.reply(text="Currently broadcasting... This may take a while.", quote=True)
+        broadcast = await database.create_broadcast(
+            from_chat_id=message.chat.id,
+            message_id=message.reply_to_message.id,
+            notice_chat_id=notice_message.chat.id,
+            notice_message_id=notice_message.id,
+            pin=pin,
+        )
+        self.launch(client=client, broadcast=broadcast)
+        return notice_message
+
+    async def resume(self, client: Client) -> None:
+        """
+        Resumes every broadcast that was interrupted by a restart.
+
+        Parameters:
+            client (Client): The Pyrogram client instance.
+        """
+        for broadcast in await database.get_running_broadcasts():
+            self.logger.info(
+                "Resuming broadcast %s at snapshot position %d",
+                broadcast["_id"],
+                broadcast["position"],
+            )
+            self.launch(client=client, broadcast=broadcast)
+
+    def cancel(self) -> int:
+        """
+        Cancels every running broadcast.
+
+        Returns:
+            int: The amount of cancelled broadcasts.
+        """
+        for cancelled in self._cancelled.values():
+            cancelled.set()
+        return len(self._cancelled)
+
+    def launch(self, client: Client, broadcast: dict) -> None:
+        """
+        Runs a broadcast in the background.
+
+        Parameters:
+            client (Client): The Pyrogram client instance.
+            broadcast (dict): The broadcast document.
+        """
+        self._cancelled[broadcast["_id"]] = asyncio.Event()
+        task = asyncio.create_task(self.run(client=client, broadcast=broadcast))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def run(self, client: Client, broadcast: dict) -> None:
+        """
+        Sends a broadcast to every user after its checkpoint.
+
+        Parameters:
+            client (Client): The Pyrogram client instance.
+            broadcast (dict): The broadcast document.
+        """
+        cancelled = self._cancelled[broadcast["_id"]]
+        progress = BroadcastProgress(broadcast=broadcast)
+
+        if broadcast["snapshot"] is None or not Path(broadcast["snapshot"]).exists():
+            # A redeploy can lose the snapshot directory, the position is found again in a new snapshot.
+            snapshot_lost = broadcast["snapshot"] is not None
+            broadcast["snapshot"] = await audience_snapshot.prepare(keep=set(self._snapshots.values()))
+            await database.set_broadcast_snapshot(broadcast_id=broadcast["_id"], snapshot=broadcast["snapshot"])
+            if snapshot_lost and progress.last_user_id is not None:
+                progress.position = audience_snapshot.position_after(
+                    path=broadcast["snapshot"],
+                    user_id=progress.last_user_id,
+                )
+                self.logger.warning(
+                    "Broadcast %s snapshot was rebuilt, resuming after user %d",
+                    broadcast["_id"],
+                    progress.last_user_id,
+                )
+        self._snapshots[broadcast["_id"]] = broadcast["snapshot"]
+
+        try:
+            source = await client.get_messages(chat_id=broadcast["from_chat_id"], message_ids=broadcast["message_id"])
+        except RPCError:
+            source = None
+        if not source or source.empty:
+            self.logger.warning("Broadcast %s message no longer exists", broadcast["_id"])
+            cancelled.set()
+        else:
+            queue: asyncio.Queue[tuple[int, int]] = asyncio.Queue(maxsize=config.BROADCAST_CONCURRENCY * 2)
+            tasks = [
+                asyncio.create_task(self.sender(source=source, pin=broadcast["pin"], queue=queue, progress=progress))
+                for _ in range(config.BROADCAST_CONCURRENCY)
+            ]
+            tasks.append(asyncio.create_task(self.checkpointer(client=client, broadcast=broadcast, progress=progress)))
+
+            try:
+                with audience_snapshot.open(broadcast["snapshot"]) as snapshot_ids:
+                    for offset in range(progress.position, len(snapshot_ids)):
+                        if cancelled.is_set():
+                            break
+                        progress.dispatch(offset=offset)
+                        await queue.put((offset, snapshot_ids[offset]))
+                    await queue.join()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # Lets the checkpointer flush the unreachable users collected since its last checkpoint.
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        status = "cancelled" if cancelled.is_set() else "finished"
+        await self.checkpoint(client=client, broadcast=broadcast, progress=progress, status=status.capitalize())
+        await database.finish_broadcast(broadcast_id=broadcast["_id"], status=status)
+        self._cancelled.pop(broadcast["_id"], None)
+        self._snapshots.pop(broadcast["_id"], None)
+
+    async def sender(
+        self,
+        source: Message,
+        pin: bool,  # noqa: FBT001
+        queue: asyncio.Queue[tuple[int, int]],
+        progress: BroadcastProgress,
+    ) -> None:
+        """
+        Copies the broadcast message to users taken from the queue until cancelled.
+
+        Any error only fails the user it was sent to, a sender that stopped would leave run blocked on the
+        full queue once every sender stopped.
+        """
+        while True:
+            offset, user_id = await queue.get()
+            try:
+                broadcast_message = await send_scheduler.send(
+                    user_id,
+                    source.copy,
+                    user_id,
+                    priority=SendPriority.BROADCAST,
+                )
+                if pin:
+                    await send_scheduler.send(
+                        user_id,
+                        broadcast_message.pin,
+                        both_sides=True,
+                        priority=SendPriority.BROADCAST,
+                    )
+                progress.successful += 1
+            except self.DEAD_USER_ERRORS:
+                progress.unsuccessful += 1
+                progress.dead_ids.append(user_id)
+            except Exception:
+                progress.unsuccessful += 1
+                self.logger.exception("Couldn't broadcast to user: %d", user_id)
+            finally:
+                progress.handled(offset=offset, user_id=user_id)
+                queue.task_done()
+
+    async def checkpointer(self, client: Client, broadcast: dict, progress: BroadcastProgress) -> None:
+        """
+        Checkpoints the broadcast every config.BROADCAST_CHECKPOINT_SECONDS until cancelled.
+
+        Cancelled on shutdown too, so the unreachable users collected since the last checkpoint are removed
+        before it exits, otherwise they would be sent to again once the broadcast resumes.
+        """
+        try:
+            while True:
+                await asyncio.sleep(config.BROADCAST_CHECKPOINT_SECONDS)
+                await self.checkpoint(client=client, broadcast=broadcast, progress=progress, status="Running")
+        finally:
+            await self.cleanup_dead_ids(progress=progress)
+
+    @staticmethod
+    async def cleanup_dead_ids(progress: BroadcastProgress) -> None:
+        """
+        Removes the unreachable users of a broadcast from the database.
+
+        The users are only dropped from the progress once removed, so an interrupted cleanup is retried.
+        """
+        if not progress.dead_ids:
+            return
+        # The snapshot doesn't keep which collection a user came from, so they are removed from both.
+        dead_ids = list(progress.dead_ids)
+        await database.cleanup_users(unsuccessful_ids=dead_ids, unsuccessful_ids_codex=dead_ids)
+        del progress.dead_ids[: len(dead_ids)]
+
+    async def checkpoint(self, client: Client, broadcast: dict, progress: BroadcastProgress, status: str) -> None:
+        """
+        Removes unreachable users, saves the progress and edits the progress message.
+
+        Unreachable users are removed before the position is saved, so a crash in between only repeats sends.
+        """
+        await self.cleanup_dead_ids(progress=progress)
+        await database.checkpoint_broadcast(
+            broadcast_id=broadcast["_id"],
+            position=progress.position,
+            last_user_id=progress.last_user_id,
+            successful=progress.successful,
+            unsuccessful=progress.unsuccessful,
+        )
+
+        with contextlib.suppress(RPCError):
+            await send_scheduler.send(
+                broadcast["notice_chat_id"],
+                client.edit_message_text,
+                chat_id=broadcast["notice_chat_id"],
+                message_id=broadcast["notice_message_id"],
+                text=(
+                    f">Broadcasting {status}:\n"
+                    f"Successful: {progress.successful}\n"
+                    f"Unsuccessful: {progress.unsuccessful}"
+                ),
+            )
+
+
+broadcast_engine = BroadcastEngine()
@@ -1,11 +1,21 @@
 from .data_encoding import DataEncoder, DataValidationError
+from .delivery_registry import DeliveryRegistry
+from .delivery_scheduler import DeliveryScheduler
 from .pyrohelper import NoInviteLinkError, PyroHelper
-from .rate_limiter import RateLimiter
+from .rate_limiter import ArrivalTimeStore, RateLimiter
+from .send_scheduler import SendPriority, SendScheduler
+from .ttl_cache import AsyncTTLCache
 
 __all__ = [
+    "ArrivalTimeStore",
+    "AsyncTTLCache",
     "DataEncoder",
     "DataValidationError",
+    "DeliveryRegistry",
+    "DeliveryScheduler",
     "NoInviteLinkError",
     "PyroHelper",
     "RateLimiter",
+    "SendPriority",
+    "SendScheduler",
 ]
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+
+from lru import LRU
+
+from bot.config import config
+
+
+class DeliveryRegistry:
+    """
+    Collapses repeated deliveries of the same link to the same user.
+
+    A request for a (user, link) pair that is already being delivered waits for the running delivery
+    instead of starting another one, and a request within window seconds of a successful delivery is
+    skipped since the user already has the files. The caller tells the user about skipped requests,
+    otherwise a repeated tap on the link shows nothing. Once the files of a user are auto deleted,
+    release_user forgets the user's deliveries, the files are no longer in the chat.
+
+    Parameters:
+        window (float): The default amount of seconds a successful delivery is not repeated.
+        maxsize (int): The maximum amount of users to remember recent deliveries of.
+    """
+
+    def __init__(self, window: float, maxsize: int) -> None:
+        self.window = window
+        self.skipped_concurrent = 0
+        self.skipped_recent = 0
+        self._in_flight: dict[tuple[int, str], asyncio.Future[bool]] = {}
+        self._recent: LRU = LRU(maxsize)  # user_id -> {link: expiry time}
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the amount of in flight deliveries and skipped duplicates.
+
+        Returns:
+            dict[str, int]: The registry stats.
+        """
+        return {
+            "in_flight": len(self._in_flight),
+            "skipped_concurrent": self.skipped_concurrent,
+            "skipped_recent": self.skipped_recent,
+        }
+
+    def release(self, user_id: int, link: str) -> None:
+        """
+        Forgets a delivery, so the next request for the link is delivered again.
+
+        Parameters:
+            user_id (int): The user the link was delivered to.
+            link (str): The delivered link.
+        """
+        self._recent.get(user_id, {}).pop(link, None)
+        in_flight = self._in_flight.pop((user_id, link), None)
+        if in_flight is not None and not in_flight.done():
+            in_flight.set_result(False)
+
+    def release_user(self, user_id: int) -> None:
+        """
+        Forgets every recent delivery of a user, e.g. after the delivered files were deleted.
+
+        Parameters:
+            user_id (int): The user the links were delivered to.
+        """
+        self._recent.pop(user_id, None)
+
+    async def run(
+        self,
+        user_id: int,
+        link: str,
+        deliver: Callable[[], Awaitable[bool]],
+        window: float | None = None,
+    ) -> bool:
+        """
+        Runs a delivery unless the same link is being or was just delivered to the user.
+
+        Parameters:
+            user_id (int): The user the link is delivered to.
+            link (str): The requested link.
+            deliver (Callable[[], Awaitable[bool]]): Delivers the link, returns whether it succeeded.
+            window (float | None): The amount of seconds this delivery is not repeated. Defaults to the registry window.
+
+        Returns:
+            bool: False if it was skipped as a duplicate of a successful delivery, True otherwise. A duplicate of
+                a failed delivery returns True, the failed delivery already told the user.
+        """
+        key = (user_id, link)
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.skipped_concurrent += 1
+            return not await asyncio.shield(in_flight)
+
+        expiry = self._recent.get(user_id, {}).get(link)
+        if expiry is not None and time.monotonic() < expiry:
+            self.skipped_recent += 1
+            return False
+
+        future: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+
+        delivered = False
+        try:
+            delivered = await deliver()
+        finally:
+            if self._in_flight.get(key) is future:
+                self._in_flight.pop(key)
+            if delivered:
+                now = time.monotonic()
+                recent = {
+                    recent_link: recent_expiry
+                    for recent_link, recent_expiry in self._recent.get(user_id, {}).items()
+                    if recent_expiry > now
+                }
+                recent[link] = now + (self.window if window is None else window)
+                self._recent[user_id] = recent
+            if not future.done():
+                future.set_result(delivered)
+
+        return True
+
+
+delivery_registry = DeliveryRegistry(window=config.DELIVERY_DEDUPE_SECONDS, maxsize=config.DELIVERY_DEDUPE_SIZE)
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Coroutine
+from typing import Any, Generic, TypeVar
+
+from bot.config import config
+
+T = TypeVar("T")
+
+DeliverySlice = tuple[int, Callable[[], Awaitable[list[T]]]]
+
+
+class DeliveryJob(Generic[T]):
+    """
+    A submitted delivery, split into slices that are sent one after another.
+    """
+
+    __slots__ = ("future", "results", "size", "slices", "submitted")
+
+    def __init__(self, slices: list[DeliverySlice[T]]) -> None:
+        self.slices = deque(slices)
+        self.size = sum(size for size, _ in slices)
+        self.results: list[T] = []
+        self.submitted = time.perf_counter()
+        self.future: asyncio.Future[list[T]] = asyncio.get_running_loop().create_future()
+
+
+class DeliveryFlow:
+    """
+    The pending deliveries of a single user and its deficit counter.
+    """
+
+    __slots__ = ("deficit", "jobs", "user_id")
+
+    def __init__(self, user_id: int) -> None:
+        self.user_id = user_id
+        self.deficit = 0
+        self.jobs: deque[DeliveryJob] = deque()
+
+
+class DeliveryScheduler:
+    """
+    Shares the delivery workers fairly between users with deficit round robin.
+
+    Every delivery is split into slices weighted by their amount of files. Users take turns, each turn
+    adds quantum files to the user's deficit and a slice is only sent once it fits the deficit, so a
+    large manifest is delivered a slice per turn, alternating with the requests of other users.
+    Users whose next delivery has at most small_size files wait in a separate lane that is served
+    first, large deliveries still get every SMALL_STREAK-th turn so they are never starved.
+    A user has at most one slice in flight, which keeps the files of a delivery in order.
+
+    Parameters:
+        workers (int): The amount of slices sent at the same time.
+        quantum (int): The amount of files added to a user's deficit every turn.
+        small_size (int): The maximum amount of files of a delivery served in the small lane.
+    """
+
+    SMALL_STREAK = 4
+    LATENCY_SAMPLES = 1000
+
+    def __init__(self, workers: int, quantum: int, small_size: int) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.workers = workers
+        self.quantum = quantum
+        self.small_size = small_size
+
+        self._flows: dict[int, DeliveryFlow] = {}
+        self._small_lane: deque[DeliveryFlow] = deque()
+        self._large_lane: deque[DeliveryFlow] = deque()
+        self._small_streak = 0
+        self._latencies: dict[str, deque[float]] = {
+            "small": deque(maxlen=self.LATENCY_SAMPLES),
+            "large": deque(maxlen=self.LATENCY_SAMPLES),
+        }
+        self._wakeup = asyncio.Event()
+        self._worker_tasks: list[asyncio.Task] = []
+        self._background_tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def percentile(samples: deque[float], quantile: float) -> float:
+        """
+        Returns the nearest-rank percentile of the samples, 0 if there are none.
+        """
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(int(len(ordered) * quantile), len(ordered) - 1)]
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns the amount of waiting deliveries and the delivery latency percentiles in seconds.
+
+        Returns:
+            dict[str, float]: The scheduler stats.
+        """
+        return {
+            "waiting": sum(len(flow.jobs) for flow in self._flows.values()),
+            "small_p50": self.percentile(self._latencies["small"], 0.5),
+            "small_p99": self.percentile(self._latencies["small"], 0.99),
+            "large_p50": self.percentile(self._latencies["large"], 0.5),
+            "large_p99": self.percentile(self._latencies["large"], 0.99),
+        }
+
+    def run_in_background(self, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        """
+        Runs a coroutine without awaiting it, so a handler can return while its delivery is queued.
+
+        Parameters:
+            coro (Coroutine[Any, Any, Any]): The coroutine to run.
+
+        Returns:
+            asyncio.Task: The task, callers add a done callback to handle its result.
+        """
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def submit(self, user_id: int, slices: list[DeliverySlice[T]]) -> list[T]:
+        """
+        Queues a delivery and waits until every slice of it was sent.
+
+        Parameters:
+            user_id (int): The user the delivery goes to.
+            slices (list[DeliverySlice[T]]): The slices of the delivery as (amount of files, send function).
+
+        Returns:
+            list[T]: The results of every slice, in slice order.
+        """
+        if not self._worker_tasks:
+            self._worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+        job: DeliveryJob[T] = DeliveryJob(slices)
+        if not job.slices:
+            return []
+
+        flow = self._flows.get(user_id)
+        if flow is None:
+            flow = self._flows[user_id] = DeliveryFlow(user_id)
+            flow.jobs.append(job)
+            self._activate(flow)
+        else:
+            # The flow is either queued in a lane or has a slice in flight, it is picked up from there.
+            flow.jobs.append(job)
+
+        return await job.future
+
+    def _activate(self, flow: DeliveryFlow) -> None:
+        lane = self._small_lane if flow.jobs[0].size <= self.small_size else self._large_lane
+        lane.append(flow)
+        self._wakeup.set()
+
+    def _next_flow(self) -> DeliveryFlow | None:
+        """
+        Picks the next flow whose next slice fits its deficit.
+
+        Returns:
+            DeliveryFlow | None: The picked flow, None if no flow is waiting.
+        """
+        if self._large_lane and (self._small_streak >= self.SMALL_STREAK or not self._small_lane):
+            lanes = (self._large_lane, self._small_lane)
+        else:
+            lanes = (self._small_lane, self._large_lane)
+
+        for lane in lanes:
+            while lane:
+                flow = lane.popleft()
+                flow.deficit += self.quantum
+                slice_size = flow.jobs[0].slices[0][0]
+                if slice_size <= flow.deficit:
+                    flow.deficit = min(flow.deficit - slice_size, self.quantum)
+                    self._small_streak = self._small_streak + 1 if lane is self._small_lane else 0
+                    return flow
+                lane.append(flow)
+        return None
+
+    async def _work(self) -> None:
+        while True:
+            flow = self._next_flow()
+            if flow is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            job = flow.jobs[0]
+            _, send_slice = job.slices.popleft()
+            try:
+                job.results.extend(await send_slice())
+            except Exception:
+                self.logger.exception("Delivery slice failed, user: %d", flow.user_id)
+
+            if not job.slices:
+                flow.jobs.popleft()
+                latency = time.perf_counter() - job.submitted
+                self._latencies["small" if job.size <= self.small_size else "large"].append(latency)
+                if not job.future.done():
+                    job.future.set_result(job.results)
+
+            if flow.jobs:
+                self._activate(flow)
+            else:
+                self._flows.pop(flow.user_id, None)
+
+
+delivery_scheduler = DeliveryScheduler(
+    workers=config.DELIVERY_WORKERS,
+    quantum=config.DELIVERY_QUANTUM,
+    small_size=config.DELIVERY_SMALL_SIZE,
+)
@@ -6,6 +6,8 @@ from pyrogram.types import Message
 
 from bot.config import ChannelInfo, config
 
+from .send_scheduler import send_scheduler
+
 
 class NoInviteLinkError(Exception):
     def __init__(self, channel: int | str) -> None:
@@ -74,9 +76,14 @@ class PyroHelper:
             message_origin = await client.get_messages(chat_id=config.BACKUP_CHANNEL, message_ids=option_key)
 
             if message_origin:
-                return cast(Message, await message_origin.copy(chat_id=message.chat.id, **kwargs))  # pyright: ignore[reportCallIssue]
+                return cast(
+                    Message,
+                    await send_scheduler.send(message.chat.id, message_origin.copy, chat_id=message.chat.id, **kwargs),
+                )
 
-        return await message.reply(
+        return await send_scheduler.send(
+            message.chat.id,
+            message.reply,
             text=str(option_key),
             **kwargs,
         )
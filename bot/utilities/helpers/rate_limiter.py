@@ -1,67 +1,194 @@
 import asyncio
 import logging
 import time
+from collections import OrderedDict
 from collections.abc import Callable
-from functools import wraps
-from typing import ClassVar
+from functools import partial, wraps
+from typing import Any, ClassVar
 
-from lru import LRU
+from pyrogram import ContinuePropagation, StopPropagation
 from pyrogram.client import Client
 from pyrogram.types import Message
 
 from bot.config import config
 
 
+class ArrivalTimeStore:
+    """
+    Stores one theoretical arrival time per chat, ordered by last update.
+
+    Chats whose arrival time has passed hold no state and are swept a few at a time on every update,
+    max_chats only bounds memory when more chats than that are active at once.
+
+    Every update adds at most one chat, so sweeping more than one per update drains expired chats faster
+    than they are added. The sweep stops at the least recently updated chat if its arrival time is still
+    ahead, which is at most RateLimiter.BURST_SECONDS, so expired chats behind it wait that long at most.
+
+    Parameters:
+        max_chats (int): The maximum amount of chats to keep.
+        sweep_batch (int): The maximum amount of expired chats removed per update, at least 2.
+    """
+
+    __slots__ = ("_arrival_times", "max_chats", "sweep_batch")
+
+    def __init__(self, max_chats: int, sweep_batch: int = 2) -> None:
+        self.max_chats = max_chats
+        self.sweep_batch = max(sweep_batch, 2)
+        self._arrival_times: OrderedDict[int, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._arrival_times)
+
+    def get(self, chat_id: int, default: float) -> float:
+        """
+        Returns the arrival time of a chat.
+
+        Parameters:
+            chat_id (int): The chat ID.
+            default (float): Returned if the chat has no state.
+
+        Returns:
+            float: The arrival time.
+        """
+        return self._arrival_times.get(chat_id, default)
+
+    def set(self, chat_id: int, arrival_time: float, now: float) -> None:
+        """
+        Stores the arrival time of a chat and sweeps expired chats.
+
+        Parameters:
+            chat_id (int): The chat ID.
+            arrival_time (float): The new arrival time.
+            now (float): The current monotonic time.
+        """
+        arrival_times = self._arrival_times
+        arrival_times[chat_id] = arrival_time
+        arrival_times.move_to_end(chat_id)
+
+        for _ in range(self.sweep_batch):
+            if not arrival_times:
+                break
+            oldest_arrival_time = next(iter(arrival_times.values()))
+            if oldest_arrival_time > now and len(arrival_times) <= self.max_chats:
+                break
+            arrival_times.popitem(last=False)
+
+
 class RateLimiter:
     """
     A experimental pyrogram rate limiter which use to limit the amount of update or command that bot handles.
 
+    It uses the generic cell rate algorithm (GCRA): each chat stores a theoretical arrival time
+    which moves forward by EMISSION_INTERVAL per execution, admission is O(1) and needs no background thread.
+
+    Over the limit updates are handled by config.RATE_LIMITER_MODE:
+        drop: the update is dropped.
+        defer: the update is parked in a bounded per chat queue and executed by the event loop once the chat
+            has budget again, dropped if the queue is full.
+        sleep: the handler sleeps until the chat has budget again, this blocks an update worker.
+
     Attributes:
         MAX_EXECUTIONS_PER_MINUTE_SAME_CHAT (ClassVar[int]):
             The maximum number of executions per minute for the same chat ID.
-        chat_execution_counts (ClassVar[LRU]):
-            A lru dictionary to store the execution counts for each chat ID.
-        last_second_reset (ClassVar[float]):
-            The time of the last second reset.
-        last_minute_reset (ClassVar[float]):
-            The time of the last minute reset.
+        BURST_SECONDS (ClassVar[float]):
+            How far ahead of now a chat's arrival time may be before it has to wait.
+        EMISSION_INTERVAL (ClassVar[float]):
+            The amount of seconds a single execution costs.
+        TOLERANCE (ClassVar[float]):
+            Waits shorter than this are float error, e.g. 25 * 2.4 > 60, and would cost the last execution of a burst.
+        chat_arrival_times (ClassVar[ArrivalTimeStore]):
+            Stores the theoretical arrival time for each chat ID.
+        deferred_counts (ClassVar[dict[int, int]]):
+            The amount of deferred executions for each chat ID.
+        dropped_count (ClassVar[int]):
+            The amount of dropped executions since startup.
     """
 
     logger = logging.getLogger(__name__)
 
     MAX_EXECUTIONS_PER_MINUTE_SAME_CHAT: ClassVar[int] = 25
+    BURST_SECONDS: ClassVar[float] = 60
+    EMISSION_INTERVAL: ClassVar[float] = BURST_SECONDS / MAX_EXECUTIONS_PER_MINUTE_SAME_CHAT
+    TOLERANCE: ClassVar[float] = 1e-6
 
-    chat_execution_counts: ClassVar[LRU] = LRU(100)
+    chat_arrival_times: ClassVar[ArrivalTimeStore] = ArrivalTimeStore(
+        max_chats=config.RATE_LIMITER_MAX_CHATS,
+        sweep_batch=config.RATE_LIMITER_SWEEP_BATCH,
+    )
 
-    last_second_reset: ClassVar[float] = time.perf_counter()
-    last_minute_reset: ClassVar[float] = time.perf_counter()
+    deferred_counts: ClassVar[dict[int, int]] = {}
+    dropped_count: ClassVar[int] = 0
+    _deferred_tasks: ClassVar[set[asyncio.Task]] = set()
 
     @classmethod
-    def cooldown_limiter(cls) -> None:
+    def reserve(cls, chat_id: int, func_count: int = 1, *, reserve_late: bool = True) -> float:
         """
-        Used to update every minute with new time and chat_execution_counts per id.
-        Moves queue to execs for rate limiter.
-        Deletes the key if there's nothing to execute or queue.
-        Should only be runned once during startup."""
-        exec_per_min = cls.MAX_EXECUTIONS_PER_MINUTE_SAME_CHAT
-        cls.logger.info("cooldown_limiter Started...")
-
-        while True:
-            current_time = time.perf_counter()
-            if current_time - cls.last_minute_reset >= 60:  # noqa: PLR2004
-                cls.last_minute_reset = current_time
-                for key, value in cls.chat_execution_counts.items():
-                    queue = value.get("queue", 0)
-                    execs, new_queue = (queue, 0) if queue <= exec_per_min else (exec_per_min, queue - exec_per_min)
-
-                    if execs == 0 and new_queue == 0:
-                        cls.chat_execution_counts.pop(key)
-                    else:
-                        cls.chat_execution_counts.update({key: {"exec": execs, "queue": new_queue}})
-            time.sleep(2)
+        Reserves executions for a chat.
+
+        Parameters:
+            chat_id (int): The chat ID.
+            func_count (int): The number of executions to reserve.
+            reserve_late (bool): Whether to reserve the executions even if the chat has to wait for them.
+
+        Returns:
+            float: The amount of seconds to wait before executing, 0 if it can execute right away.
+        """
+        now = time.monotonic()
+        arrival_time = max(cls.chat_arrival_times.get(chat_id, now), now)
+        new_arrival_time = arrival_time + cls.EMISSION_INTERVAL * func_count
+        wait_time = new_arrival_time - now - cls.BURST_SECONDS
+        if wait_time < cls.TOLERANCE:
+            wait_time = 0.0
+
+        if not wait_time or reserve_late:
+            cls.chat_arrival_times.set(chat_id=chat_id, arrival_time=new_arrival_time, now=now)
+        return wait_time
+
+    @classmethod
+    def stats(cls) -> dict[str, int]:
+        """
+        Returns the current deferred queue depth and the dropped executions count.
+
+        Returns:
+            dict[str, int]: The deferred and dropped counts.
+        """
+        return {"deferred": sum(cls.deferred_counts.values()), "dropped": cls.dropped_count}
 
     @classmethod
-    def hybrid_limiter(cls, func_count: int = 1) -> Callable[[Callable], Callable]:
+    def defer(cls, wait_time: float, chat_id: int, func: Callable, *args: Any) -> None:  # noqa: ANN401
+        """
+        Schedules a deferred execution on the event loop.
+
+        Parameters:
+            wait_time (float): The amount of seconds to wait before executing.
+            chat_id (int): The chat ID.
+            func (Callable): The function to execute.
+            *args (Any): The function arguments.
+        """
+        cls.deferred_counts[chat_id] = cls.deferred_counts.get(chat_id, 0) + 1
+        asyncio.get_running_loop().call_later(wait_time, cls._start_deferred, chat_id, func, args)
+
+    @classmethod
+    def _start_deferred(cls, chat_id: int, func: Callable, args: tuple) -> None:
+        deferred_count = cls.deferred_counts.pop(chat_id, 1) - 1
+        if deferred_count:
+            cls.deferred_counts[chat_id] = deferred_count
+
+        task = asyncio.create_task(cls._run_deferred(func, *args))
+        cls._deferred_tasks.add(task)
+        task.add_done_callback(cls._deferred_tasks.discard)
+
+    @classmethod
+    async def _run_deferred(cls, func: Callable, *args: Any) -> None:  # noqa: ANN401
+        try:
+            await func(*args)
+        except (StopPropagation, ContinuePropagation):
+            pass
+        except Exception:
+            cls.logger.exception("Deferred execution failed")
+
+    @classmethod
+    def hybrid_limiter(cls, func_count: int = 1, mode: str | None = None) -> Callable[[Callable], Callable]:
         """
         A hybrid rate limiter decorator.
 
@@ -69,6 +196,8 @@ class RateLimiter:
             func_count (int):
                 The number of function executions to count. Defaults to 1.
                 If your function sends 2 message set to 2.
+            mode (str | None):
+                Overrides config.RATE_LIMITER_MODE, use "sleep" when the caller needs the result.
 
         Returns:
             Callable[[Callable], Callable]: A decorator function.
@@ -92,27 +221,31 @@ class RateLimiter:
                     return await func(client, message, *args, **kwargs)
 
                 chat_id = message.chat.id
+                limiter_mode = mode or config.RATE_LIMITER_MODE
+                can_defer = cls.deferred_counts.get(chat_id, 0) < config.RATE_LIMITER_QUEUE_SIZE
+                wait_time = cls.reserve(
+                    chat_id=chat_id,
+                    func_count=func_count,
+                    reserve_late=limiter_mode == "sleep" or (limiter_mode == "defer" and can_defer),
+                )
+
+                if not wait_time:
+                    return await func(client, message, *args, **kwargs)
 
-                cls.chat_execution_counts.setdefault(chat_id, {"exec": 0, "queue": 0})
-
-                user_dict = cls.chat_execution_counts[chat_id]
-                now = time.perf_counter()
-                elapsed_time_minute = now - cls.last_minute_reset
-
-                if user_dict["exec"] >= cls.MAX_EXECUTIONS_PER_MINUTE_SAME_CHAT:
-                    cls.chat_execution_counts[chat_id]["queue"] += func_count
-
-                    sleep_time = 60
-                    sleep_queue = (user_dict["queue"] // cls.MAX_EXECUTIONS_PER_MINUTE_SAME_CHAT) + 1
-
-                    total_sleep = (sleep_time * sleep_queue) - elapsed_time_minute
-
-                    cls.logger.info("Waiting for %d seconds... before next execution, id: %d", total_sleep, chat_id)
-                    await asyncio.sleep(total_sleep)
+                if limiter_mode == "sleep":
+                    cls.logger.info("Waiting for %d seconds... before next execution, id: %d", wait_time, chat_id)
+                    await asyncio.sleep(wait_time)
+                    return await func(client, message, *args, **kwargs)
 
-                cls.chat_execution_counts.setdefault(chat_id, {"exec": 0, "queue": 0})["exec"] += func_count
+                if limiter_mode == "defer" and can_defer:
+                    cls.logger.info("Deferring for %d seconds... before next execution, id: %d", wait_time, chat_id)
+                    cls.defer(wait_time, chat_id, partial(func, client, message, *args, **kwargs))
+                else:
+                    cls.logger.info("Dropping execution, id: %d", chat_id)
+                    cls.dropped_count += 1
 
-                return await func(client, message, *args, **kwargs)
+                # Other handler groups of the same update would be over the limit as well.
+                return message.stop_propagation()
 
             return wrapper
 
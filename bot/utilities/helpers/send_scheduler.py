@@ -0,0 +1,201 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from enum import IntEnum
+from typing import Any, TypeVar, cast
+
+from pyrogram.errors import FloodWait
+
+from bot.config import config
+
+from .rate_limiter import ArrivalTimeStore
+
+T = TypeVar("T")
+
+
+class SendPriority(IntEnum):
+    """
+    Outbound lanes, lower values are served first.
+    """
+
+    INTERACTIVE = 0
+    BROADCAST = 1
+
+
+class SendScheduler:
+    """
+    Schedules every outbound telegram send through a global and a per chat budget.
+
+    The global budget is a token bucket refilled at global_rate per second, each chat is paced by GCRA
+    at chat_rate per second with a burst of chat_burst sends. Waiting sends are granted lane by lane so
+    interactive deliveries go ahead of broadcasts. A FloodWait pauses the chat and halves the global rate,
+    which then recovers a little on every successful send.
+
+    Parameters:
+        global_rate (float): The maximum amount of sends per second.
+        chat_rate (float): The maximum amount of sends per second to the same chat.
+        chat_burst (int): The amount of sends a chat may receive at once.
+        max_retries (int): How many times a send is retried after a FloodWait.
+    """
+
+    SCAN_LIMIT = 32
+    RATE_RECOVERY = 0.05
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: int, max_retries: int) -> None:
+        self.logger = logging.getLogger(__name__)
+        self.max_global_rate = global_rate
+        self.global_rate = global_rate
+        self.chat_interval = 1 / chat_rate
+        self.chat_burst_seconds = self.chat_interval * (chat_burst - 1)
+        self.max_retries = max_retries
+        self.flood_waits = 0
+
+        self._tokens = global_rate
+        self._last_refill = time.monotonic()
+        self._chat_arrival_times = ArrivalTimeStore(max_chats=config.RATE_LIMITER_MAX_CHATS)
+        self._lanes: tuple[deque[tuple[int, asyncio.Future[None]]], ...] = tuple(deque() for _ in SendPriority)
+        self._wakeup = asyncio.Event()
+        self._dispatcher: asyncio.Task | None = None
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns the current global rate, waiting sends and FloodWait count.
+
+        Returns:
+            dict[str, float]: The scheduler stats.
+        """
+        return {
+            "global_rate": self.global_rate,
+            "waiting": sum(len(lane) for lane in self._lanes),
+            "flood_waits": self.flood_waits,
+        }
+
+    async def send(
+        self,
+        chat_id: int,
+        func: Callable[..., Awaitable[T]],
+        /,
+        *args: Any,  # noqa: ANN401
+        priority: SendPriority = SendPriority.INTERACTIVE,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> T:
+        """
+        Waits for budget then calls a send function, retrying it after a FloodWait.
+
+        Parameters:
+            chat_id (int): The chat the send goes to.
+            func (Callable[..., Awaitable[T]]): The send function, e.g. client.send_message.
+            *args (Any): The send function arguments.
+            priority (SendPriority): The lane of the send.
+            **kwargs (Any): The send function keyword arguments.
+
+        Returns:
+            T: The result of the send function.
+
+        Raises:
+            FloodWait: If the send still hits a FloodWait after max_retries.
+        """
+        retries = 0
+        while True:
+            await self.acquire(chat_id=chat_id, priority=priority)
+            try:
+                result = await func(*args, **kwargs)
+            except FloodWait as e:
+                self.flood_wait(chat_id=chat_id, seconds=float(cast(float, e.value)))
+                retries += 1
+                if retries > self.max_retries:
+                    raise
+                continue
+
+            self.global_rate = min(self.global_rate + self.RATE_RECOVERY, self.max_global_rate)
+            return result
+
+    async def acquire(self, chat_id: int, priority: SendPriority = SendPriority.INTERACTIVE) -> None:
+        """
+        Waits until a send to the chat fits the global and the chat budget.
+
+        Parameters:
+            chat_id (int): The chat the send goes to.
+            priority (SendPriority): The lane of the send.
+        """
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._lanes[priority].append((chat_id, future))
+        self._wakeup.set()
+        await future
+
+    def flood_wait(self, chat_id: int, seconds: float) -> None:
+        """
+        Pauses a chat for the FloodWait duration and slows the global rate down.
+
+        Parameters:
+            chat_id (int): The chat that raised the FloodWait.
+            seconds (float): The FloodWait duration.
+        """
+        self.flood_waits += 1
+        self.global_rate = max(self.global_rate / 2, 1.0)
+
+        now = time.monotonic()
+        self._chat_arrival_times.set(chat_id=chat_id, arrival_time=now + seconds + self.chat_burst_seconds, now=now)
+        self.logger.warning("FloodWait of %d seconds, chat: %d, global rate: %.1f", seconds, chat_id, self.global_rate)
+
+    def _grant(self, lane: deque[tuple[int, asyncio.Future[None]]], now: float) -> float | None:
+        """
+        Grants the first waiting send of a lane whose chat has budget.
+
+        Returns:
+            float | None: None if a send was granted, otherwise the earliest time a scanned chat has budget.
+        """
+        earliest = float("inf")
+        for index, (chat_id, future) in enumerate(lane):
+            if index >= self.SCAN_LIMIT:
+                break
+            if future.done():
+                del lane[index]
+                return None
+
+            arrival_time = max(self._chat_arrival_times.get(chat_id, now), now)
+            ready_time = arrival_time - self.chat_burst_seconds
+            if ready_time <= now:
+                del lane[index]
+                self._tokens -= 1
+                self._chat_arrival_times.set(chat_id=chat_id, arrival_time=arrival_time + self.chat_interval, now=now)
+                future.set_result(None)
+                return None
+            earliest = min(earliest, ready_time)
+        return earliest
+
+    async def _dispatch(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self._tokens + (now - self._last_refill) * self.global_rate, self.global_rate)
+            self._last_refill = now
+
+            next_wakeup = float("inf")
+            for lane in self._lanes:
+                while lane and self._tokens >= 1:
+                    ready_time = self._grant(lane, now)
+                    if ready_time is not None:
+                        next_wakeup = min(next_wakeup, ready_time)
+                        break
+                if self._tokens < 1:
+                    next_wakeup = min(next_wakeup, now + (1 - self._tokens) / self.global_rate)
+                    break
+
+            self._wakeup.clear()
+            timeout = None if next_wakeup == float("inf") else max(next_wakeup - now, 0.001)
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+
+
+send_scheduler = SendScheduler(
+    global_rate=config.SEND_GLOBAL_RATE,
+    chat_rate=config.SEND_CHAT_RATE,
+    chat_burst=config.SEND_CHAT_BURST,
+    max_retries=config.SEND_MAX_RETRIES,
+)
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+from lru import LRU
+
+T = TypeVar("T")
+
+
+class AsyncTTLCache(Generic[T]):
+    """
+    A bounded read-through cache with per-entry ttl and request coalescing.
+
+    Concurrent misses for the same key share a single loader call.
+
+    Parameters:
+        maxsize (int): The maximum amount of entries to keep.
+        ttl (float): The amount of seconds an entry stays valid.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: LRU = LRU(maxsize)
+        self._pending: dict[Hashable, asyncio.Future[T]] = {}
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The ratio of lookups answered without calling the loader.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[T]]) -> T:
+        """
+        Returns the cached value for a key or loads it once for every concurrent caller.
+
+        Parameters:
+            key (Hashable): The cache key.
+            loader (Callable[[], Awaitable[T]]): Called to fetch the value on a miss.
+
+        Returns:
+            T: The cached or freshly loaded value.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            self._release(key, future)
+            future.cancel()
+            raise
+        except Exception as exc:
+            self._release(key, future)
+            future.set_exception(exc)
+            # Mark the exception as retrieved in case nobody else is waiting for it.
+            future.exception()
+            raise
+
+        # Skip storing a value that was invalidated while it was loading.
+        if self._release(key, future):
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+        future.set_result(value)
+        return value
+
+    def _release(self, key: Hashable, future: asyncio.Future[T]) -> bool:
+        if self._pending.get(key) is future:
+            self._pending.pop(key)
+            return True
+        return False
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Drops a key so the next lookup reads through to the loader.
+
+        Parameters:
+            key (Hashable): The cache key.
+        """
+        self._entries.pop(key, None)
+        self._pending.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Drops every key so every lookup reads through to the loader.
+        """
+        self._entries.clear()
+        self._pending.clear()
@@ -1,10 +1,31 @@
+from functools import reduce
+
+from pyrogram import filters
+
 from .admins import AdminsFilter
 from .conversation import ConversationFilter, ConvoMessage
 from .subscription import SubscriptionFilter, SubscriptionMessage
+from .update_context import FilterCost, UpdateContext
 
 
 class PyroFilters(AdminsFilter, SubscriptionFilter, ConversationFilter):
-    pass
+    @staticmethod
+    def ordered(*flts: filters.Filter) -> filters.Filter:
+        """
+        Combines filters with AND, evaluating them from the cheapest to the most expensive.
+
+        Filters of equal cost keep their order, see FilterCost.
+
+        Parameters:
+            *flts (filters.Filter): The filters to combine.
+
+        Returns:
+            filters.Filter: The combined filter.
+        """
+        return reduce(
+            lambda combined, flt: combined & flt,
+            sorted(flts, key=lambda flt: getattr(flt, "cost", FilterCost.FREE)),
+        )
 
 
-__all__ = ["ConvoMessage", "SubscriptionMessage"]
+__all__ = ["ConvoMessage", "FilterCost", "SubscriptionMessage", "UpdateContext"]
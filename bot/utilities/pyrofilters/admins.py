@@ -8,6 +8,8 @@ from bot.database import MongoDB
 from bot.config import config
 from bot.options import options
 
+from .update_context import FilterCost, UpdateContext
+
 db = MongoDB()
 
 class AdminsFilter:
@@ -18,8 +20,11 @@ class AdminsFilter:
         async def func(flt: None, client: Client, message: Message) -> bool:
             user_id = message.from_user.id
             global_mode = options.settings.GLOBAL_MODE
-            
-            is_admin = await db.is_admin(user_id)
+
+            async def is_admin_check() -> bool:
+                return db.is_admin(user_id)
+
+            is_admin = await UpdateContext.of(message).memoize("admin", is_admin_check)
             return is_admin or (global_mode and allow_global)
 
-        return filters.create(func, "AdminFilter")
+        return filters.create(func, "AdminFilter", cost=FilterCost.MEMORY)
@@ -4,6 +4,8 @@ from pyrogram import filters
 from pyrogram.client import Client
 from pyrogram.types import Message
 
+from .update_context import FilterCost, UpdateContext
+
 
 class ConvoMessage(Message):
     def __init__(self) -> None:
@@ -31,7 +33,7 @@ class ConversationFilter:
             unique_id = message.chat.id + message.from_user.id
             return unique_id not in cls._convo_cache
 
-        return filters.create(func, "ConversationFilter")
+        return filters.create(func, "ConversationFilter", cost=FilterCost.MEMORY)
 
     @classmethod
     def create_conversation_filter(
@@ -52,7 +54,21 @@ class ConversationFilter:
                 A filter function that can be used with Update Handlers.
         """
 
+        convo_start_check = frozenset(convo_start if isinstance(convo_start, list | set) else [convo_start])
+
+        if convo_stop is not None:
+            convo_stop_check = frozenset(convo_stop if isinstance(convo_stop, list | set) else [convo_stop])
+        else:
+            convo_stop_check = frozenset()
+
         async def func(flt: filters.Filter, client: Client, message: ConvoMessage) -> bool:  # noqa: ARG001
+            # The filter updates the conversation state, so it must only be evaluated once per update.
+            return await UpdateContext.of(message).memoize(
+                ("conversation", convo_start_check, convo_stop_check),
+                lambda: conversation_check(message),
+            )
+
+        async def conversation_check(message: ConvoMessage) -> bool:
             text = message.text or message.caption
             unique_id = message.chat.id + message.from_user.id
 
@@ -60,13 +76,6 @@ class ConversationFilter:
             message.conversation = False
             message.convo_stop = False
 
-            convo_start_check = convo_start if isinstance(convo_start, list | set) else [convo_start]
-
-            if convo_stop is not None:
-                convo_stop_check = convo_stop if isinstance(convo_stop, list | set) else [convo_stop]
-            else:
-                convo_stop_check = []
-
             if text and text in convo_start_check:
                 message.convo_start = True
                 cls._convo_cache.add(unique_id)
@@ -83,4 +92,4 @@ class ConversationFilter:
 
             return False
 
-        return filters.create(func, "ConversationFilter")
+        return filters.create(func, "ConversationFilter", cost=FilterCost.STATEFUL)
@@ -1,7 +1,7 @@
-import datetime
+import asyncio
+import time
 from typing import ClassVar
 
-import tzlocal
 from lru import LRU
 from pyrogram import filters
 from pyrogram.client import Client
@@ -11,6 +11,9 @@ from pyrogram.types import Message
 
 from bot.config import config
 from bot.database import MongoDB
+from bot.utilities.pyrotools.user_state import UserState
+
+from .update_context import FilterCost, UpdateContext
 
 database = MongoDB()
 
@@ -24,77 +27,196 @@ class SubscriptionFilter:
     """
     A filter to check if a user is subscribed to the required channels.
 
+    Memberships are kept fresh by chat member updates of the force-sub channels,
+    the ttl is only a fallback for missed updates. Pending join requests are checked on every update.
+
     Attributes:
-        CACHE_USER_SECONDS (int): Amount of seconds before checking the user again to avoid spams.
-        _subs_cache (ClassVar[LRU[int, datetime.datetime]]): A lru dict to store user IDs and their last check time.
+        MEMBER_STATUS (ClassVar[tuple[ChatMemberStatus, ...]]): Member statuses that count as subscribed.
+        CACHE_USER_SECONDS (int): Amount of seconds before checking the user again.
+        _subs_cache (ClassVar[LRU[int, tuple[int, float]]]):
+            A lru dict to store user IDs and a bitmask of joined channels with its expiry time.
+        _subs_checks (ClassVar[dict[int, asyncio.Task[bool]]]): In-flight subscription checks per user ID.
+        _subs_semaphore (ClassVar[asyncio.Semaphore]): Caps the amount of concurrent get_chat_member calls.
     """
 
-    CACHE_USER_SECONDS: int = 15
-    _subs_cache: ClassVar[LRU] = LRU(10)
+    MEMBER_STATUS: ClassVar[tuple[ChatMemberStatus, ...]] = (
+        ChatMemberStatus.OWNER,
+        ChatMemberStatus.ADMINISTRATOR,
+        ChatMemberStatus.MEMBER,
+    )
+    CACHE_USER_SECONDS: int = config.SUBSCRIPTION_CACHE_SECONDS
+    _subs_cache: ClassVar[LRU] = LRU(config.SUBSCRIPTION_CACHE_SIZE)
+    _subs_checks: ClassVar[dict[int, asyncio.Task[bool]]] = {}
+    _subs_semaphore: ClassVar[asyncio.Semaphore] = asyncio.Semaphore(config.FORCE_SUB_CONCURRENCY)
+
+    @staticmethod
+    def channel_bit(channel_id: int) -> int:
+        """
+        Returns the bit of a force-sub channel inside the membership bitmask.
+
+        Parameters:
+            channel_id (int): The force-sub channel id.
+
+        Returns:
+            int: The channel bit, or 0 if it is not a force-sub channel.
+        """
+        if channel_id not in config.FORCE_SUB_CHANNELS:
+            return 0
+        return 1 << config.FORCE_SUB_CHANNELS.index(channel_id)
 
     @classmethod
-    def subscription(cls) -> filters.Filter:
+    def cached_channels(cls, user_id: int) -> int:
         """
-        Creates a filter to check if a user is subscribed to the required channels.
+        Returns the bitmask of channels the user is known to have joined.
+
+        Parameters:
+            user_id (int): The user id.
 
         Returns:
-            filters.Filter: A filter to check if a user is subscribed to the required channels.
+            int: The channel bitmask, 0 if unknown or expired.
         """
+        cached = cls._subs_cache.get(user_id)
+        if cached is None:
+            return 0
 
-        async def func(flt: None, client: Client, message: SubscriptionMessage) -> bool:  # noqa: ARG001
-            """
-            Checks if a user is subscribed to the required channels.
+        channels, expire_time = cached
+        if expire_time <= time.monotonic():
+            cls._subs_cache.pop(user_id, None)
+            return 0
+        return channels
+
+    @classmethod
+    def mark_member(cls, user_id: int, channel_id: int) -> None:
+        """
+        Marks a user as a member of a force-sub channel.
+
+        Parameters:
+            user_id (int): The user id.
+            channel_id (int): The force-sub channel id.
+        """
+        channels = cls.cached_channels(user_id) | cls.channel_bit(channel_id)
+        cls._subs_cache[user_id] = (channels, time.monotonic() + cls.CACHE_USER_SECONDS)
+
+    @classmethod
+    def forget_member(cls, user_id: int, channel_id: int) -> None:
+        """
+        Removes a force-sub channel from the user's known memberships.
+
+        Parameters:
+            user_id (int): The user id.
+            channel_id (int): The force-sub channel id.
+        """
+        cached = cls._subs_cache.get(user_id)
+        if cached is not None:
+            channels, expire_time = cached
+            cls._subs_cache[user_id] = (channels & ~cls.channel_bit(channel_id), expire_time)
+
+    @classmethod
+    async def check_channel(cls, client: Client, channel_id: int, user_id: int) -> bool | None:
+        """
+        Checks the user's membership of a single force-sub channel.
+
+        Parameters:
+            client (Client): The Pyrogram client.
+            channel_id (int): The force-sub channel id.
+            user_id (int): The user id.
 
-            Parameters:
-                client (Client): The Pyrogram client.
-                message (Message): The message to check.
+        Returns:
+            bool | None: Whether the user is a member, None if the user is not a participant.
+        """
+        async with cls._subs_semaphore:
+            try:
+                member = await client.get_chat_member(chat_id=channel_id, user_id=user_id)
+            except UserNotParticipant:
+                return None
+        return member.status in cls.MEMBER_STATUS
 
-            Returns:
-                bool: True if the user is subscribed, False otherwise.
-            """
+    @classmethod
+    async def check_channels(cls, client: Client, message: Message) -> bool:
+        """
+        Checks every force-sub channel the user is not known to have joined concurrently.
 
-            user_id = message.from_user.id
-            status = [
-                ChatMemberStatus.OWNER,
-                ChatMemberStatus.ADMINISTRATOR,
-                ChatMemberStatus.MEMBER,
-            ]
+        Parameters:
+            client (Client): The Pyrogram client.
+            message (Message): The message of the user.
 
-            if user_id in config.ROOT_ADMINS_ID or not config.FORCE_SUB_CHANNELS:
-                return True
+        Returns:
+            bool: True if the user is subscribed, False otherwise.
+        """
+        user_id = message.from_user.id
+        cached_channels = cls.cached_channels(user_id)
+        channel_ids = [
+            channel_info["channel_id"]
+            for channel_info in config.channels_n_invite.values()
+            if not cached_channels & cls.channel_bit(channel_info["channel_id"])
+        ]
+
+        results = await asyncio.gather(
+            *(cls.check_channel(client=client, channel_id=channel_id, user_id=user_id) for channel_id in channel_ids),
+        )
+
+        if False in results:
+            return False
+
+        not_participant = [
+            channel_id for channel_id, result in zip(channel_ids, results, strict=True) if result is None
+        ]
+        if not_participant:
+            if not config.PRIVATE_REQUEST:
+                return False
 
-            if await database.is_user_banned(user_id):
-                message.user_is_banned = True
+            user_state = await UserState.load(database=database, message=message)
+            if any(channel_id not in user_state.channels for channel_id in not_participant):
                 return False
 
-            if user_id in cls._subs_cache:
-                user_cache_time = cls._subs_cache.get(user_id)
-                current_time = datetime.datetime.now(tz=tzlocal.get_localzone())
+        # A pending join request isn't cached, it can be withdrawn or declined without a member update.
+        for channel_id, result in zip(channel_ids, results, strict=True):
+            if result:
+                cls.mark_member(user_id=user_id, channel_id=channel_id)
+        return True
+
+    @classmethod
+    def subscription(cls) -> filters.Filter:
+        """
+        Creates a filter to check if a user is subscribed to the required channels.
 
-                if user_cache_time and (current_time - user_cache_time) <= datetime.timedelta(
-                    seconds=cls.CACHE_USER_SECONDS,
-                ):
-                    return True
+        Returns:
+            filters.Filter: A filter to check if a user is subscribed to the required channels.
+        """
 
-                cls._subs_cache.pop(user_id)
+        async def func(flt: None, client: Client, message: SubscriptionMessage) -> bool:  # noqa: ARG001
+            return await UpdateContext.of(message).memoize(
+                "subscribed",
+                lambda: cls.is_subscribed(client=client, message=message),
+            )
 
-            for channel_info in config.channels_n_invite.values():
-                channel_id = channel_info["channel_id"]
+        return filters.create(func, "SubscriptionFilter", cost=FilterCost.API)
 
-                try:
-                    member = await client.get_chat_member(chat_id=channel_id, user_id=user_id)
+    @classmethod
+    async def is_subscribed(cls, client: Client, message: SubscriptionMessage) -> bool:
+        """
+        Checks if a user is subscribed to the required channels.
 
-                    if member.status not in status:
-                        return False
+        Parameters:
+            client (Client): The Pyrogram client.
+            message (Message): The message to check.
 
-                except UserNotParticipant:
-                    joined_request_channel = await database.user_requested_channels(user_id)
-                    if (not config.PRIVATE_REQUEST) or (
-                        channel_id not in joined_request_channel and config.PRIVATE_REQUEST
-                    ):
-                        return False
+        Returns:
+            bool: True if the user is subscribed, False otherwise.
+        """
+        user_id = message.from_user.id
 
-            cls._subs_cache[user_id] = datetime.datetime.now(tz=tzlocal.get_localzone())
+        if user_id in config.ROOT_ADMINS_ID or not config.FORCE_SUB_CHANNELS:
             return True
 
-        return filters.create(func, "SubscriptionFilter")
+        if database.is_user_banned(user_id):
+            message.user_is_banned = True
+            return False
+
+        subs_check = cls._subs_checks.get(user_id)
+        if subs_check is None:
+            subs_check = asyncio.create_task(cls.check_channels(client=client, message=message))
+            cls._subs_checks[user_id] = subs_check
+            subs_check.add_done_callback(lambda _: cls._subs_checks.pop(user_id, None))
+
+        return await asyncio.shield(subs_check)
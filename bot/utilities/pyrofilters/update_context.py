@@ -0,0 +1,91 @@
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from enum import IntEnum
+from typing import Any, ClassVar, TypeVar
+
+from pyrogram.types import Message
+
+T = TypeVar("T")
+
+
+class FilterCost(IntEnum):
+    """
+    The cost of evaluating a filter, cheaper filters are evaluated first by PyroFilters.ordered.
+    Pyrogram's own filters have no cost and count as FREE.
+    """
+
+    FREE = 0
+    MEMORY = 1
+    API = 10
+    # Filters with side effects, evaluated last so they only run once every other filter passed.
+    STATEFUL = 100
+
+
+class UpdateContext:
+    """
+    Facts about an update that are computed once and shared by every filter and handler group.
+
+    Pyrogram hands the same Message object to every handler group, so the context is stored on it.
+    Memoized computations are timed, the averages show what filters cost per update.
+
+    Attributes:
+        memo (dict[Hashable, Any]): The computed facts of the update.
+        _timings (ClassVar[dict[str, list[float]]]): Evaluations and total seconds per fact name.
+    """
+
+    __slots__ = ("memo",)
+
+    _timings: ClassVar[dict[str, list[float]]] = {}
+
+    def __init__(self) -> None:
+        self.memo: dict[Hashable, Any] = {}
+
+    @classmethod
+    def of(cls, message: Message) -> "UpdateContext":
+        """
+        Returns the context of a message's update, creating it on first use.
+
+        Parameters:
+            message (Message): The message of the update.
+
+        Returns:
+            UpdateContext: The update context.
+        """
+        update_context: UpdateContext | None = getattr(message, "update_context", None)
+        if update_context is None:
+            update_context = cls()
+            message.update_context = update_context  # type: ignore[reportAttributeAccessIssue]
+        return update_context
+
+    @classmethod
+    def stats(cls) -> dict[str, float]:
+        """
+        Returns the average evaluation time of every memoized fact in milliseconds.
+
+        Returns:
+            dict[str, float]: The average milliseconds per fact name.
+        """
+        return {name: total / evaluations * 1000 for name, (evaluations, total) in cls._timings.items()}
+
+    async def memoize(self, key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+        """
+        Returns a fact of the update, computing it only the first time it is asked for.
+
+        Parameters:
+            key (Hashable): The fact key, a tuple key is timed under its first item.
+            compute (Callable[[], Awaitable[T]]): Computes the fact.
+
+        Returns:
+            T: The fact.
+        """
+        if key in self.memo:
+            return self.memo[key]
+
+        started = time.perf_counter()
+        value = await compute()
+        timing = self._timings.setdefault(str(key[0] if isinstance(key, tuple) else key), [0, 0.0])
+        timing[0] += 1
+        timing[1] += time.perf_counter() - started
+
+        self.memo[key] = value
+        return value
@@ -1,9 +1,10 @@
-from .file_resolver import FileResolverModel, SendMedia
+from .file_resolver import FileResolverModel, LinkManifest, SendMedia
 from .help_cmd import HelpCmd
+from .user_state import UserState
 
 
 class Pyrotools(SendMedia):
     pass
 
 
-__all__ = ["FileResolverModel", "HelpCmd"]
+__all__ = ["FileResolverModel", "HelpCmd", "LinkManifest", "UserState"]
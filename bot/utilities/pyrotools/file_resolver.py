@@ -1,12 +1,18 @@
-import contextlib
-from typing import TYPE_CHECKING, Any, cast
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, ClassVar
 
+from lru import LRU
 from pydantic import BaseModel
 from pyrogram.client import Client
+from pyrogram.errors import MessageEmpty, MessageIdInvalid, RPCError
 from pyrogram.file_id import FileId
-from pyrogram.types import Message
+from pyrogram.types import InputMediaPhoto, InputMediaVideo, Message
 
+from bot.config import config
+from bot.database import MongoDB
 from bot.options import options
+from bot.utilities.helpers.send_scheduler import send_scheduler
 
 if TYPE_CHECKING:
     from collections.abc import Callable
@@ -26,6 +32,38 @@ class FileResolverModel(BaseModel):
     message_id: int
 
 
+class LinkManifest(BaseModel):
+    """
+    Represents a decoded and validated link document.
+
+    Parameters:
+        file_origin (int): Where the files came from.
+        files (list[FileResolverModel]): The files of the link.
+    """
+
+    file_origin: int
+    files: list[FileResolverModel]
+
+    @classmethod
+    async def resolve(cls, database: MongoDB, base64_file_link: str) -> "LinkManifest | None":
+        """
+        Resolves a link through the shared link cache, reading from the database on a miss.
+
+        Parameters:
+            database (MongoDB): The database instance.
+            base64_file_link (str): The base64-encoded link to the file.
+
+        Returns:
+            LinkManifest | None: The validated manifest, or None if the link does not exist.
+        """
+
+        async def load_manifest() -> LinkManifest | None:
+            file_document = await database.get_link_document(base64_file_link=base64_file_link)
+            return cls.model_validate(file_document) if file_document else None
+
+        return await database.link_cache.get_or_load(base64_file_link, load_manifest)
+
+
 class UnsupportedFileError(Exception):
     """
     Raised when an unsupported file type is encountered.
@@ -38,8 +76,17 @@ class UnsupportedFileError(Exception):
 class SendMedia:
     """
     Provides methods for sending media files.
+
+    Attributes:
+        _deleted_backup_messages (ClassVar[LRU]):
+            A lru dict of (file_origin, message_id) known to be deleted, these are sent by file_id right away.
     """
 
+    logger = logging.getLogger(__name__)
+
+    album_limit_size = 10
+    _deleted_backup_messages: ClassVar[LRU] = LRU(config.DELETED_BACKUP_CACHE_SIZE)
+
     @classmethod
     async def send_media(
         cls,
@@ -63,12 +110,29 @@ class SendMedia:
 
         Raises:
             UnsupportedFileError: If the file type is unsupported.
+            RPCError: If the file couldn't be sent to the chat.
         """
 
-        if options.settings.BACKUP_FILES:
-            get_file = await client.get_messages(chat_id=file_origin, message_ids=file_data.message_id)
-            if not getattr(get_file, "empty", False):
-                return cast(Message, await get_file.copy(chat_id=chat_id))  # pyright: ignore[reportCallIssue]
+        backup_message = (file_origin, file_data.message_id)
+        if options.settings.BACKUP_FILES and backup_message not in cls._deleted_backup_messages:
+            # A forward without the sender name copies the message in a single request.
+            try:
+                send_files = await send_scheduler.send(
+                    chat_id,
+                    client.forward_messages,
+                    chat_id=chat_id,
+                    from_chat_id=file_origin,
+                    message_ids=[file_data.message_id],
+                    hide_sender_name=True,
+                    protect_content=protect_content,
+                )
+            except (MessageIdInvalid, MessageEmpty):
+                # Only these mean the backup message is gone, other errors come from the recipient.
+                send_files = None
+
+            if send_files:
+                return send_files[0]
+            cls._deleted_backup_messages[backup_message] = True
 
         file_type_data = FileId.decode(file_id=file_data.file_id)
         methods: dict[str, Callable[..., Any]] = {
@@ -90,7 +154,9 @@ class SendMedia:
                 if file_type != "STICKER":
                     file_kwargs["caption"] = file_data.caption or ""
 
-                return await methods[file_type](
+                return await send_scheduler.send(
+                    chat_id,
+                    methods[file_type],
                     **file_kwargs,  # pyright: ignore[reportCallIssue]
                     # https://github.com/microsoft/pyright/issues/5069#issuecomment-1533839392
                 )
@@ -109,6 +175,10 @@ class SendMedia:
         """
         Sends a media group.
 
+        If the backup messages are gone the files are sent by file_id, albums and single files in parallel.
+        A failed album is sent file by file instead and a failed file is skipped, so once any file was
+        sent nothing is raised and the caller can tell the missing files by the amount of sent messages.
+
         Parameters:
             client (Client): The Pyrogram client.
             chat_id (int): The chat ID.
@@ -117,9 +187,14 @@ class SendMedia:
 
         Returns:
             Message: The sent message.
+
+        Raises:
+            RPCError: If no file could be sent.
         """
         messaage_ids = [i.message_id for i in file_data]
-        send_files = await client.forward_messages(
+        send_files = await send_scheduler.send(
+            chat_id,
+            client.forward_messages,
             chat_id=chat_id,
             from_chat_id=file_origin,
             message_ids=messaage_ids,
@@ -130,10 +205,16 @@ class SendMedia:
         if send_files:
             return send_files
 
-        send_files_message = []
+        # The backup messages are gone, skip the forward attempt of every single file.
         for i in file_data:
-            with contextlib.suppress(UnsupportedFileError):
-                send_files_message.append(
+            cls._deleted_backup_messages[(file_origin, i.message_id)] = True
+
+        semaphore = asyncio.Semaphore(config.DELIVERY_FALLBACK_CONCURRENCY)
+        errors: list[RPCError] = []
+
+        async def send_file(i: FileResolverModel) -> list[Message]:
+            try:
+                return [
                     await cls.send_media(
                         client=client,
                         chat_id=chat_id,
@@ -141,6 +222,96 @@ class SendMedia:
                         file_origin=file_origin,
                         protect_content=protect_content,
                     ),
-                )
+                ]
+            except UnsupportedFileError:
+                return []
+            except RPCError as e:
+                cls.logger.warning("Couldn't send file %d, chat: %d: %s", i.message_id, chat_id, e)
+                errors.append(e)
+                return []
+
+        async def send_segment(segment: list[FileResolverModel]) -> list[Message]:
+            async with semaphore:
+                if len(segment) == 1:
+                    return await send_file(segment[0])
+                try:
+                    return await cls.send_album(
+                        client=client,
+                        chat_id=chat_id,
+                        file_data=segment,
+                        protect_content=protect_content,
+                    )
+                except RPCError as e:
+                    cls.logger.warning("Couldn't send album, chat: %d, sending its files one by one: %s", chat_id, e)
+                    return [message for i in segment for message in await send_file(i)]
+
+        sent_segments = await asyncio.gather(*(send_segment(segment) for segment in cls.album_segments(file_data)))
+        send_files = [send_file for sent_segment in sent_segments for send_file in sent_segment]
+        if errors and not send_files:
+            raise errors[0]
+        return send_files
 
-        return send_files_message
+    @classmethod
+    def album_segments(cls, file_data: list[FileResolverModel]) -> list[list[FileResolverModel]]:
+        """
+        Splits files into ordered segments, consecutive photos and videos are grouped into albums.
+
+        Parameters:
+            file_data (list[FileResolverModel]): The list of file data.
+
+        Returns:
+            list[list[FileResolverModel]]: Albums of up to 10 files and single files, in the original order.
+        """
+        segments: list[list[FileResolverModel]] = []
+        album: list[FileResolverModel] = []
+
+        for i in file_data:
+            file_type_data = FileId.decode(file_id=i.file_id)
+            if file_type_data and file_type_data.file_type.name in ("PHOTO", "VIDEO"):
+                album.append(i)
+                if len(album) == cls.album_limit_size:
+                    segments.append(album)
+                    album = []
+                continue
+
+            if album:
+                segments.append(album)
+                album = []
+            segments.append([i])
+
+        if album:
+            segments.append(album)
+        return segments
+
+    @classmethod
+    async def send_album(
+        cls,
+        client: Client,
+        chat_id: int,
+        file_data: list[FileResolverModel],
+        protect_content: bool,  # noqa: FBT001
+    ) -> list[Message]:
+        """
+        Sends photos and videos as a single album by file_id.
+
+        Parameters:
+            client (Client): The Pyrogram client.
+            chat_id (int): The chat ID.
+            file_data (list[FileResolverModel]): Up to 10 photos or videos.
+
+        Returns:
+            list[Message]: The sent messages.
+        """
+        media: list[InputMediaPhoto | InputMediaVideo] = []
+        for i in file_data:
+            file_type_data = FileId.decode(file_id=i.file_id)
+            input_media = InputMediaPhoto if file_type_data.file_type.name == "PHOTO" else InputMediaVideo
+            media.append(input_media(media=i.file_id, caption=i.caption or ""))
+
+        return await send_scheduler.send(
+            chat_id,
+            client.send_media_group,
+            chat_id=chat_id,
+            media=media,
+            protect_content=protect_content,
+        )
@@ -0,0 +1,51 @@
+from pydantic import BaseModel
+from pyrogram.types import Message
+
+from bot.database import MongoDB
+
+
+class UserState(BaseModel):
+    """
+    Everything the start path needs to know about a user, loaded with a single database round trip.
+
+    Parameters:
+        user_id (int): The ID of the user.
+        banned (bool): Whether the user is banned.
+        channels (list[int]): The private channels the user requested to join.
+    """
+
+    user_id: int
+    banned: bool
+    channels: list[int]
+
+    @classmethod
+    async def load(cls, database: MongoDB, message: Message) -> "UserState":
+        """
+        Loads the state of the message's sender, once per update.
+
+        The state is stored on the message, so every filter and handler group the update goes
+        through shares it.
+
+        Parameters:
+            database (MongoDB): The database instance.
+            message (Message): The message of the user.
+
+        Returns:
+            UserState: The user's state.
+        """
+        user_state: UserState | None = getattr(message, "user_state", None)
+        if user_state is not None:
+            return user_state
+
+        user_id = message.from_user.id
+        user_document = await database.upsert_user(user_id=user_id)
+
+        stored_channels = user_document.get("channels", [])
+        pending_channels = database.pending_user_channels(user_id)
+        user_state = cls(
+            user_id=user_id,
+            banned=user_document.get("banned", False) or database.is_user_banned(user_id),
+            channels=[*stored_channels, *(i for i in pending_channels if i not in stored_channels)],
+        )
+        message.user_state = user_state  # type: ignore[reportAttributeAccessIssue]
+        return user_state
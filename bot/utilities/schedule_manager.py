@@ -1,34 +1,102 @@
 import datetime
+import logging
+import math
+import time
+from collections.abc import Awaitable, Callable
 
 import tzlocal
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from pyrogram.client import Client
+from pyrogram.errors import FloodWait, RPCError
+
+from bot.config import config
+from bot.database import MongoDB
+from bot.utilities.helpers import SendPriority
+from bot.utilities.helpers.delivery_registry import delivery_registry
+from bot.utilities.helpers.send_scheduler import send_scheduler
+
+database = MongoDB()
 
 
 class ScheduleManager:
     """
     Manages scheduling of tasks for a Pyrogram client.
 
+    Message deletions are stored in a persistent queue and processed by a polling job,
+    so pending deletions survive restarts. The queue works as a timing wheel: due times are
+    rounded up to config.AUTO_DELETE_GRANULARITY so deliveries to the same chat within a tick
+    share a bucket, and each tick issues one delete_messages call per chat and 100 messages.
+    Deletions go through the send scheduler, buckets of a chat that is still flood waited are
+    postponed instead of cleared.
+
     Attributes:
         scheduler (AsyncIOScheduler): The scheduler instance.
+        client (Client | None): The Pyrogram client used to delete queued messages.
     """
 
+    delete_limit_size = 100
+
     def __init__(self) -> None:
         """
         Initializes the ScheduleManager instance.
         """
+        self.logger = logging.getLogger(__name__)
+        self.client: Client | None = None
         self.scheduler = AsyncIOScheduler(
             timezone=tzlocal.get_localzone(),
             misfire_grace_time=5,
         )
 
-    async def start(self) -> None:
+    async def start(self, client: Client) -> None:
         """
-        Starts the scheduler.
+        Starts the scheduler and the auto delete polling job.
+
+        The first poll runs right away in the background, it processes the deletions that became due
+        while the bot was offline without holding up the startup if telegram flood waits them.
+
+        Parameters:
+            client (Client): The Pyrogram client instance.
         """
+        self.client = client
         self.scheduler.start()
+        self.schedule_interval(func=self.process_due_deletes, seconds=config.AUTO_DELETE_GRANULARITY, run_now=True)
 
-    async def delete_messages(self, client: Client, chat_id: int, message_ids: list[int]) -> None:
+    def schedule_interval(self, func: Callable[[], Awaitable[None]], seconds: int, *, run_now: bool = False) -> None:
+        """
+        Schedules a task to run every n seconds.
+
+        Parameters:
+            func (Callable[[], Awaitable[None]]): The coroutine function to run.
+            seconds (int): The number of seconds between runs.
+            run_now (bool): Whether the first run starts right away instead of after n seconds.
+        """
+        # APScheduler pauses a job added with next_run_time=None, so it is only passed to run now.
+        run_now_kwargs = {"next_run_time": datetime.datetime.now(tz=datetime.timezone.utc)} if run_now else {}
+        self.scheduler.add_job(
+            func=func,
+            trigger="interval",
+            seconds=seconds,
+            max_instances=1,
+            coalesce=True,
+            **run_now_kwargs,
+        )
+
+    @staticmethod
+    def tick_time(timestamp: float) -> datetime.datetime:
+        """
+        Rounds a timestamp up to the next auto delete tick.
+
+        Parameters:
+            timestamp (float): The POSIX timestamp.
+
+        Returns:
+            datetime.datetime: The time of the tick.
+        """
+        granularity = config.AUTO_DELETE_GRANULARITY
+        tick = math.ceil(timestamp / granularity)
+        return datetime.datetime.fromtimestamp(tick * granularity, tz=datetime.timezone.utc)
+
+    async def delete_messages(self, client: Client, chat_id: int, message_ids: list[int]) -> float | None:
         """
         Deletes messages from a chat.
 
@@ -36,12 +104,68 @@ class ScheduleManager:
             client (Client): The Pyrogram client instance.
             chat_id (int): The chat ID.
             message_ids (list[int]): The list of message IDs to delete.
+
+        Returns:
+            float | None: The FloodWait seconds if the chat is still flood waited after the send scheduler's
+                retries, None once the messages are deleted or can't be deleted at all.
         """
-        await client.delete_messages(chat_id=chat_id, message_ids=message_ids)
+        try:
+            await send_scheduler.send(
+                chat_id,
+                client.delete_messages,
+                chat_id=chat_id,
+                message_ids=message_ids,
+                priority=SendPriority.BROADCAST,
+            )
+        except FloodWait as e:
+            self.logger.warning("Couldn't delete messages, chat: %d, flood waited for %s seconds", chat_id, e.value)
+            return float(e.value)  # type: ignore[reportArgumentType]
+        except RPCError:
+            self.logger.exception("Couldn't delete messages, chat: %d", chat_id)
+        return None
+
+    async def process_due_deletes(self) -> None:
+        """
+        Deletes every due message in the persistent queue, batch by batch.
+        """
+        if self.client is None:
+            return
+
+        while True:
+            due_deletes = await database.get_due_auto_deletes(limit=config.AUTO_DELETE_BATCH_SIZE)
+
+            chats_due_deletes: dict[int, list[dict]] = {}
+            for due_delete in due_deletes:
+                chats_due_deletes.setdefault(due_delete["chat_id"], []).append(due_delete)
+
+            for chat_id, chat_due_deletes in chats_due_deletes.items():
+                message_ids = [message_id for due in chat_due_deletes for message_id in due["message_ids"]]
+                queue_ids = [due["_id"] for due in chat_due_deletes]
+
+                for i in range(0, len(message_ids), self.delete_limit_size):
+                    flood_wait = await self.delete_messages(
+                        client=self.client,
+                        chat_id=chat_id,
+                        message_ids=message_ids[i : i + self.delete_limit_size],
+                    )
+                    if flood_wait is not None:
+                        # Messages deleted before the FloodWait are deleted again, which telegram ignores.
+                        await database.postpone_auto_deletes(
+                            queue_ids=queue_ids,
+                            delete_at=self.tick_time(time.time() + max(flood_wait, config.AUTO_DELETE_GRANULARITY)),
+                        )
+                        break
+                else:
+                    await database.clear_auto_deletes(queue_ids=queue_ids)
+                    # Deliveries go to private chats, the chat id is the user the files were delivered to.
+                    delivery_registry.release_user(user_id=chat_id)
+
+            if len(due_deletes) < config.AUTO_DELETE_BATCH_SIZE:
+                return
 
     async def schedule_delete(
         self,
-        client: Client,
+        client: Client,  # noqa: ARG002
         chat_id: int,
         message_ids: list[int],
         delete_n_seconds: int,
@@ -55,12 +179,10 @@ class ScheduleManager:
             message_ids (list[int]): The list of message IDs to delete.
             delete_n_seconds (int): The number of seconds to wait before deleting.
         """
-        now = datetime.datetime.now(tz=tzlocal.get_localzone())
-        self.scheduler.add_job(
-            func=self.delete_messages,
-            trigger="date",
-            run_date=now + datetime.timedelta(seconds=delete_n_seconds),
-            args=[client, chat_id, message_ids],
+        await database.push_auto_delete(
+            chat_id=chat_id,
+            message_ids=message_ids,
+            delete_at=self.tick_time(time.time() + delete_n_seconds),
         )
 
 
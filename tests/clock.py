@@ -0,0 +1,16 @@
+class Clock:
+    """
+    A manually advanced stand-in for the time module's clocks.
+    """
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
@@ -0,0 +1,8 @@
+import os
+
+import pytest
+
+# A MongoDB url used by the tests that need a real database, MongoDB instances created on import use it as well.
+TEST_MONGO_DB_URL = os.environ.get("TEST_MONGO_DB_URL")
+
+requires_mongo = pytest.mark.skipif(not TEST_MONGO_DB_URL, reason="TEST_MONGO_DB_URL is not set")
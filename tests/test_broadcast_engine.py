@@ -0,0 +1,185 @@
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from pyrogram.errors import UserIsBlocked
+
+from bot.utilities import audience_snapshot as audience_snapshot_module
+from bot.utilities import broadcast_engine as broadcast_engine_module
+from bot.utilities.audience_snapshot import AudienceSnapshot
+from bot.utilities.broadcast_engine import BroadcastEngine, BroadcastProgress
+from bot.utilities.helpers import SendScheduler
+
+
+@pytest.fixture(autouse=True)
+def send_scheduler(monkeypatch: pytest.MonkeyPatch, fast_send_scheduler: Callable[[], SendScheduler]) -> None:
+    monkeypatch.setattr(broadcast_engine_module, "send_scheduler", fast_send_scheduler())
+
+
+class Source:
+    """
+    The broadcast message, copies to users in errors raise their error instead.
+    """
+
+    empty = False
+
+    def __init__(self, errors: dict[int, Exception]) -> None:
+        self.errors = errors
+        self.copied: list[int] = []
+
+    async def copy(self, user_id: int) -> SimpleNamespace:
+        if user_id in self.errors:
+            raise self.errors[user_id]
+        self.copied.append(user_id)
+        return SimpleNamespace(id=user_id)
+
+
+class BroadcastClient:
+    """
+    Returns the broadcast message and ignores progress message edits.
+    """
+
+    def __init__(self, source: Source) -> None:
+        self.source = source
+
+    async def get_messages(self, chat_id: int, message_ids: int) -> Source:  # noqa: ARG002
+        return self.source
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str) -> None:
+        pass
+
+
+class BroadcastDatabase:
+    """
+    The user and Broadcasts collection methods of MongoDB a broadcast uses, kept in memory.
+    """
+
+    def __init__(self, user_ids: list[int]) -> None:
+        self.user_ids = user_ids
+        self.checkpoints: list[dict] = []
+
+    async def iter_user_ids(self) -> AsyncIterator[tuple[int, bool, bool]]:
+        for user_id in sorted(self.user_ids):
+            yield user_id, True, False
+
+    async def set_broadcast_snapshot(self, broadcast_id: int, snapshot: str) -> bool:  # noqa: ARG002
+        return True
+
+    async def cleanup_users(self, unsuccessful_ids: list, unsuccessful_ids_codex: list) -> None:
+        for user_id in unsuccessful_ids + unsuccessful_ids_codex:
+            if user_id in self.user_ids:
+                self.user_ids.remove(user_id)
+
+    async def checkpoint_broadcast(self, broadcast_id: int, **progress: int) -> bool:  # noqa: ARG002
+        self.checkpoints.append(progress)
+        return True
+
+    async def finish_broadcast(self, broadcast_id: int, status: str) -> bool:  # noqa: ARG002
+        self.status = status
+        return True
+
+
+def snapshots(monkeypatch: pytest.MonkeyPatch, tmp_path: Path, user_ids: list[int]) -> BroadcastDatabase:
+    database = BroadcastDatabase(user_ids=user_ids)
+    monkeypatch.setattr(broadcast_engine_module, "database", database)
+    monkeypatch.setattr(audience_snapshot_module, "database", database)
+    snapshot = AudienceSnapshot(directory=str(tmp_path), max_age=3600)
+    monkeypatch.setattr(broadcast_engine_module, "audience_snapshot", snapshot)
+    return database
+
+
+def test_sender_errors_only_fail_their_user() -> None:
+    engine = BroadcastEngine()
+    source = Source(errors={2: UserIsBlocked(), 3: AttributeError("copy"), 4: ValueError("media")})
+    progress = BroadcastProgress(broadcast={"position": 0, "successful": 0, "unsuccessful": 0})
+
+    async def broadcast() -> None:
+        queue: asyncio.Queue[tuple[int, int]] = asyncio.Queue(maxsize=2)
+        sender = asyncio.create_task(engine.sender(source=source, pin=False, queue=queue, progress=progress))  # type: ignore[reportArgumentType]
+        for offset, user_id in enumerate(range(1, 7)):
+            progress.dispatch(offset=offset)
+            await asyncio.wait_for(queue.put((offset, user_id)), timeout=1)
+        await asyncio.wait_for(queue.join(), timeout=1)
+        sender.cancel()
+
+    asyncio.run(broadcast())
+    assert source.copied == [1, 5, 6]
+    assert (progress.successful, progress.unsuccessful, progress.position) == (3, 3, 6)
+    assert progress.dead_ids == [2]
+
+
+def test_a_cancelled_checkpointer_removes_the_pending_dead_users(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    database = snapshots(monkeypatch, tmp_path, user_ids=[1, 2, 3])
+    engine = BroadcastEngine()
+    progress = BroadcastProgress(broadcast={"position": 0, "successful": 0, "unsuccessful": 0})
+
+    async def shutdown() -> None:
+        checkpointer = asyncio.create_task(engine.checkpointer(client=None, broadcast={}, progress=progress))  # type: ignore[reportArgumentType]
+        await asyncio.sleep(0)
+        progress.dead_ids.append(2)
+        checkpointer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await checkpointer
+
+    asyncio.run(shutdown())
+    assert database.user_ids == [1, 3]
+    assert progress.dead_ids == []
+    assert database.checkpoints == []
+
+
+def test_position_is_tracked_with_the_last_handled_user() -> None:
+    progress = BroadcastProgress(broadcast={"position": 0, "successful": 0, "unsuccessful": 0})
+    for offset in range(3):
+        progress.dispatch(offset=offset)
+
+    progress.handled(offset=1, user_id=20)
+    assert (progress.position, progress.last_user_id) == (0, None)
+    progress.handled(offset=0, user_id=10)
+    assert (progress.position, progress.last_user_id) == (2, 20)
+
+
+def test_position_after_a_user(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    snapshots(monkeypatch, tmp_path, user_ids=[10, 20, 30, 40])
+    snapshot = broadcast_engine_module.audience_snapshot
+    path = str(asyncio.run(snapshot.build()))
+
+    assert snapshot.position_after(path=path, user_id=20) == 2  # noqa: PLR2004
+    # A removed user is placed where it would be sorted.
+    assert snapshot.position_after(path=path, user_id=25) == 2  # noqa: PLR2004
+    assert snapshot.position_after(path=path, user_id=40) == 4  # noqa: PLR2004
+
+
+def test_a_lost_snapshot_is_rebuilt_and_resumed(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    database = snapshots(monkeypatch, tmp_path, user_ids=[10, 20, 30, 40, 50, 60])
+    # The broadcast was at user 30 when the deploy lost its snapshot, user 20 was removed meanwhile.
+    database.user_ids.remove(20)
+    source = Source(errors={})
+    client = BroadcastClient(source=source)
+    broadcast = {
+        "_id": 1,
+        "from_chat_id": 1,
+        "message_id": 1,
+        "notice_chat_id": 1,
+        "notice_message_id": 1,
+        "pin": False,
+        "snapshot": str(tmp_path / "lost.snapshot"),
+        "position": 3,
+        "last_user_id": 30,
+        "successful": 3,
+        "unsuccessful": 0,
+    }
+
+    async def resume() -> None:
+        engine = BroadcastEngine()
+        engine.launch(client=client, broadcast=broadcast)  # type: ignore[reportArgumentType]
+        await asyncio.wait_for(asyncio.gather(*engine._tasks), timeout=5)  # noqa: SLF001
+
+    asyncio.run(resume())
+    assert source.copied == [40, 50, 60]
+    assert database.status == "finished"
+    assert database.checkpoints[-1] == {"position": 5, "last_user_id": 60, "successful": 6, "unsuccessful": 0}
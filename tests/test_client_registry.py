@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Imports every plugin the way the client loads them and prints the amount of motor clients created.
+# Clients are pointed at a lazily connecting local url, the configured mongodb+srv url would need the network.
+COUNT_CLIENTS = """
+import importlib
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+created = []
+init = AsyncIOMotorClient.__init__
+
+
+def counting_init(self, *args, **kwargs):
+    created.append(1)
+    init(self, "mongodb://localhost:27017")
+
+
+AsyncIOMotorClient.__init__ = counting_init
+for path in sorted(Path("bot/plugins").rglob("*.py")):
+    importlib.import_module(".".join(path.with_suffix("").parts))
+print(len(created))
+"""
+
+
+def test_plugins_share_one_motor_client() -> None:
+    # Every plugin module creates MongoDB instances on import, each used to build its own client and pool.
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", COUNT_CLIENTS],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+        timeout=120,
+        check=True,
+    )
+
+    assert result.stdout.split()[-1] == "1"
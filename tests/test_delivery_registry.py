@@ -0,0 +1,97 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+import pytest
+
+from bot.utilities.helpers import DeliveryRegistry, delivery_registry
+from tests.clock import Clock
+
+
+def delivery(*, delivered: bool, runs: list[int]) -> Callable[[], Awaitable[bool]]:
+    async def deliver() -> bool:
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return delivered
+
+    return deliver
+
+
+def test_a_recent_delivery_is_skipped() -> None:
+    registry = DeliveryRegistry(window=60, maxsize=10)
+    runs = []
+
+    async def tap_twice() -> list[bool]:
+        deliver = delivery(delivered=True, runs=runs)
+        return [await registry.run(user_id=1, link="link", deliver=deliver) for _ in range(2)]
+
+    assert asyncio.run(tap_twice()) == [True, False]
+    assert len(runs) == 1
+
+
+def test_a_concurrent_tap_waits_for_the_running_delivery() -> None:
+    registry = DeliveryRegistry(window=60, maxsize=10)
+    runs = []
+
+    async def tap_twice(*, delivered: bool) -> list[bool]:
+        deliver = delivery(delivered=delivered, runs=runs)
+        taps = [registry.run(user_id=1, link=str(delivered), deliver=deliver) for _ in range(2)]
+        return list(await asyncio.gather(*taps))
+
+    assert asyncio.run(tap_twice(delivered=True)) == [True, False]
+    # The failed delivery already told the user, the duplicate must not claim the files were delivered.
+    assert asyncio.run(tap_twice(delivered=False)) == [True, True]
+    assert len(runs) == 2  # noqa: PLR2004
+
+
+def test_a_failed_delivery_is_not_recorded() -> None:
+    registry = DeliveryRegistry(window=60, maxsize=10)
+    runs = []
+
+    async def tap_twice() -> list[bool]:
+        deliver = delivery(delivered=False, runs=runs)
+        return [await registry.run(user_id=1, link="link", deliver=deliver) for _ in range(2)]
+
+    assert asyncio.run(tap_twice()) == [True, True]
+    assert len(runs) == 2  # noqa: PLR2004
+
+
+def test_a_released_delivery_is_delivered_again() -> None:
+    registry = DeliveryRegistry(window=60, maxsize=10)
+    runs = []
+
+    async def tap_twice() -> list[bool]:
+        deliver = delivery(delivered=True, runs=runs)
+        first = await registry.run(user_id=1, link="link", deliver=deliver)
+        registry.release(user_id=1, link="link")
+        return [first, await registry.run(user_id=1, link="link", deliver=deliver)]
+
+    assert asyncio.run(tap_twice()) == [True, True]
+    assert len(runs) == 2  # noqa: PLR2004
+
+
+def test_the_window_can_be_shorter_per_delivery(monkeypatch: pytest.MonkeyPatch, clock: Clock) -> None:
+    monkeypatch.setattr(delivery_registry, "time", clock)
+    registry = DeliveryRegistry(window=60, maxsize=10)
+    runs = []
+
+    async def tap(window: float | None = None) -> bool:
+        return await registry.run(user_id=1, link="link", deliver=delivery(delivered=True, runs=runs), window=window)
+
+    assert asyncio.run(tap(window=10))
+    clock.advance(9)
+    assert not asyncio.run(tap())
+    clock.advance(1)
+    assert asyncio.run(tap())
+
+
+def test_deleted_files_release_the_user() -> None:
+    registry = DeliveryRegistry(window=60, maxsize=10)
+    runs = []
+
+    async def tap_twice() -> list[bool]:
+        deliver = delivery(delivered=True, runs=runs)
+        first = await registry.run(user_id=1, link="link", deliver=deliver)
+        registry.release_user(user_id=1)
+        return [first, await registry.run(user_id=1, link="link", deliver=deliver)]
+
+    assert asyncio.run(tap_twice()) == [True, True]
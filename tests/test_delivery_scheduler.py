@@ -0,0 +1,80 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+from bot.utilities.helpers import DeliveryScheduler
+
+SLICE_SECONDS = 0.01
+SMALL_USERS = range(2, 12)
+
+
+def slice_of(results: list[int], finished: list[int] | None = None) -> Callable[[], Awaitable[list[int]]]:
+    async def send_slice() -> list[int]:
+        await asyncio.sleep(SLICE_SECONDS)
+        if finished is not None:
+            finished.extend(results)
+        return results
+
+    return send_slice
+
+
+def test_small_deliveries_are_not_starved_by_a_large_one() -> None:
+    scheduler = DeliveryScheduler(workers=1, quantum=100, small_size=10)
+
+    async def mixed_load() -> list[int]:
+        finished = []
+
+        async def small_deliveries() -> None:
+            await asyncio.sleep(SLICE_SECONDS * 3)
+            await asyncio.gather(
+                *(scheduler.submit(user_id=user, slices=[(1, slice_of([user], finished))]) for user in SMALL_USERS),
+            )
+
+        await asyncio.gather(
+            scheduler.submit(user_id=1, slices=[(100, slice_of([1], finished)) for _ in range(50)]),
+            small_deliveries(),
+        )
+        return finished
+
+    finished = asyncio.run(mixed_load())
+    # The small deliveries are sent within the next few slices, not after the 50 slices of the large one.
+    assert finished.index(SMALL_USERS[-1]) < 20  # noqa: PLR2004
+    assert finished[-1] == 1
+
+    stats = scheduler.stats()
+    assert stats["waiting"] == 0
+    assert stats["small_p99"] < stats["large_p50"]
+
+
+def test_large_deliveries_alternate_between_users() -> None:
+    scheduler = DeliveryScheduler(workers=1, quantum=100, small_size=10)
+
+    async def two_large() -> list[int]:
+        finished = []
+        await asyncio.gather(
+            scheduler.submit(user_id=1, slices=[(100, slice_of([1], finished)) for _ in range(5)]),
+            scheduler.submit(user_id=2, slices=[(100, slice_of([2], finished)) for _ in range(5)]),
+        )
+        return finished
+
+    assert asyncio.run(two_large()) == [1, 2] * 5
+
+
+def test_slices_of_a_user_keep_their_order() -> None:
+    scheduler = DeliveryScheduler(workers=4, quantum=100, small_size=10)
+
+    async def deliver() -> list[int]:
+        return await scheduler.submit(user_id=1, slices=[(50, slice_of([index])) for index in range(10)])
+
+    assert asyncio.run(deliver()) == list(range(10))
+
+
+def test_a_failed_slice_does_not_stop_the_delivery() -> None:
+    scheduler = DeliveryScheduler(workers=1, quantum=100, small_size=10)
+
+    async def fail() -> list[int]:
+        raise RuntimeError
+
+    async def deliver() -> list[int]:
+        return await scheduler.submit(user_id=1, slices=[(1, slice_of([1])), (1, fail), (1, slice_of([3]))])
+
+    assert asyncio.run(deliver()) == [1, 3]
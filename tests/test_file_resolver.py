@@ -0,0 +1,143 @@
+import asyncio
+from collections.abc import Callable
+from types import SimpleNamespace
+
+import pytest
+from lru import LRU
+from pyrogram.errors import MediaEmpty, MessageIdInvalid, UserIsBlocked
+from pyrogram.file_id import FileId, FileType, ThumbnailSource
+
+from bot.options import options
+from bot.utilities.helpers import SendScheduler
+from bot.utilities.pyrotools import file_resolver
+from bot.utilities.pyrotools.file_resolver import FileResolverModel, SendMedia
+
+
+def photo(message_id: int) -> FileResolverModel:
+    file_id = FileId(
+        file_type=FileType.PHOTO,
+        dc_id=2,
+        media_id=message_id,
+        access_hash=1,
+        volume_id=0,
+        local_id=0,
+        thumbnail_source=ThumbnailSource.THUMBNAIL,
+        thumbnail_file_type=FileType.PHOTO,
+        thumbnail_size="y",
+    )
+    return FileResolverModel(caption=None, file_id=file_id.encode(), message_id=message_id)
+
+
+class SendingClient:
+    """
+    Records every message sent to the chat, the backup messages are gone and albums with a
+    file of failing_albums raise MediaEmpty.
+    """
+
+    def __init__(self, failing_albums: set[str]) -> None:
+        self.failing_albums = failing_albums
+        self.sent: list[SimpleNamespace] = []
+
+    def send(self) -> SimpleNamespace:
+        message = SimpleNamespace(id=len(self.sent) + 1)
+        self.sent.append(message)
+        return message
+
+    async def forward_messages(self, **_: object) -> list:
+        return []
+
+    async def send_media_group(self, media: list, **_: object) -> list[SimpleNamespace]:
+        if any(input_media.media in self.failing_albums for input_media in media):
+            raise MediaEmpty
+        return [self.send() for _ in media]
+
+    async def send_photo(self, **_: object) -> SimpleNamespace:
+        return self.send()
+
+    send_audio = send_document = send_video = send_sticker = send_photo
+
+
+@pytest.fixture(autouse=True)
+def send_scheduler(monkeypatch: pytest.MonkeyPatch, fast_send_scheduler: Callable[[], SendScheduler]) -> None:
+    monkeypatch.setattr(file_resolver, "send_scheduler", fast_send_scheduler())
+
+
+def send_media_group(client: SendingClient, file_data: list[FileResolverModel]) -> list:
+    return asyncio.run(
+        SendMedia.send_media_group(client=client, chat_id=1, file_data=file_data, file_origin=-1, protect_content=True),  # type: ignore[reportArgumentType]
+    )
+
+
+def test_a_failed_album_is_sent_file_by_file() -> None:
+    file_data = [photo(message_id) for message_id in range(1, 26)]
+    client = SendingClient(failing_albums={file_data[10].file_id})
+
+    send_files = send_media_group(client, file_data)
+    assert len(send_files) == len(client.sent) == 25  # noqa: PLR2004
+
+
+def test_nothing_is_raised_once_a_file_was_sent(monkeypatch: pytest.MonkeyPatch) -> None:
+    file_data = [photo(message_id) for message_id in range(1, 26)]
+    client = SendingClient(failing_albums={file_data[10].file_id})
+
+    async def send_photo(**_: object) -> SimpleNamespace:
+        raise MediaEmpty
+
+    monkeypatch.setattr(client, "send_photo", send_photo)
+
+    send_files = send_media_group(client, file_data)
+    assert len(send_files) == len(client.sent) == 15  # noqa: PLR2004
+
+
+def test_the_error_is_raised_if_no_file_was_sent(monkeypatch: pytest.MonkeyPatch) -> None:
+    file_data = [photo(message_id) for message_id in range(1, 4)]
+    client = SendingClient(failing_albums={file_data[0].file_id})
+
+    async def send_photo(**_: object) -> SimpleNamespace:
+        raise MediaEmpty
+
+    monkeypatch.setattr(client, "send_photo", send_photo)
+
+    with pytest.raises(MediaEmpty):
+        send_media_group(client, file_data)
+    assert client.sent == []
+
+
+def send_media(client: SendingClient, file_data: FileResolverModel) -> SimpleNamespace:
+    return asyncio.run(
+        SendMedia.send_media(client=client, chat_id=1, file_data=file_data, file_origin=-1, protect_content=True),  # type: ignore[reportArgumentType]
+    )
+
+
+@pytest.fixture
+def backup_files(monkeypatch: pytest.MonkeyPatch) -> LRU:
+    monkeypatch.setattr(options.settings, "BACKUP_FILES", True)
+    deleted_backup_messages = LRU(10)
+    monkeypatch.setattr(SendMedia, "_deleted_backup_messages", deleted_backup_messages)
+    return deleted_backup_messages
+
+
+def test_a_deleted_backup_message_is_sent_by_file_id(monkeypatch: pytest.MonkeyPatch, backup_files: LRU) -> None:
+    client = SendingClient(failing_albums=set())
+
+    async def forward_messages(**_: object) -> list:
+        raise MessageIdInvalid
+
+    monkeypatch.setattr(client, "forward_messages", forward_messages)
+
+    assert send_media(client, photo(1)) == client.sent[0]
+    assert (-1, 1) in backup_files
+
+
+def test_a_recipient_error_does_not_mark_the_backup_message(monkeypatch: pytest.MonkeyPatch, backup_files: LRU) -> None:
+    client = SendingClient(failing_albums=set())
+
+    async def forward_messages(**_: object) -> list:
+        raise UserIsBlocked
+
+    monkeypatch.setattr(client, "forward_messages", forward_messages)
+
+    with pytest.raises(UserIsBlocked):
+        send_media(client, photo(1))
+    assert client.sent == []
+    assert (-1, 1) not in backup_files
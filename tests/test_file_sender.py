@@ -0,0 +1,88 @@
+import asyncio
+import functools
+from types import SimpleNamespace
+
+import pytest
+from pyrogram.errors import InternalServerError, MediaEmpty
+
+from bot.config import config
+from bot.plugins.base import start
+from bot.plugins.base.start import FileSender
+from bot.utilities.helpers import DeliveryRegistry, DeliveryScheduler
+
+
+@pytest.fixture(autouse=True)
+def fresh_delivery_scheduler(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(start, "delivery_scheduler", DeliveryScheduler(workers=4, quantum=100, small_size=10))
+
+
+def deliver(chunks: list[list[int]], errors: dict[int, list[Exception]]) -> tuple[list[int], bool, list[int]]:
+    """
+    Delivers the chunks, the first chunk item selects the errors raised by its next sends.
+
+    Returns:
+        tuple[list[int], bool, list[int]]: The delivered items, whether every chunk was sent and the sends in
+            the order they reached the chat.
+    """
+    reached: list[int] = []
+
+    async def send_chunk(chunk: list[int]) -> list[SimpleNamespace]:
+        # The first chunk is the slowest, concurrent sends would let the later chunks overtake it.
+        await asyncio.sleep(0.01 if chunk[0] == 0 else 0)
+        reached.append(chunk[0])
+        if errors.get(chunk[0]):
+            raise errors[chunk[0]].pop(0)
+        return [SimpleNamespace(id=item) for item in chunk]
+
+    send_files, complete = asyncio.run(FileSender.deliver_chunks(chat_id=1, chunks=chunks, send_chunk=send_chunk))  # type: ignore[reportArgumentType]
+    return [message.id for message in send_files], complete, reached
+
+
+def test_chunks_are_sent_one_after_another() -> None:
+    chunks = [[0, 1], [2, 3], [4, 5]]
+
+    assert deliver(chunks, errors={}) == ([0, 1, 2, 3, 4, 5], True, [0, 2, 4])
+
+
+def test_transient_errors_are_retried(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "DELIVERY_CHUNK_RETRIES", 2)
+    chunks = [[0, 1], [2, 3]]
+
+    send_files, complete, reached = deliver(chunks, errors={2: [InternalServerError(), InternalServerError()]})
+    assert (send_files, complete) == ([0, 1, 2, 3], True)
+    assert reached == [0, 2, 2, 2]
+
+
+def test_failed_chunks_make_the_delivery_incomplete(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "DELIVERY_CHUNK_RETRIES", 2)
+    chunks = [[0, 1], [2, 3], [4, 5]]
+
+    send_files, complete, reached = deliver(chunks, errors={2: [MediaEmpty()]})
+    # A BadRequest fails the same way again, the chunk is not retried.
+    assert (send_files, complete) == ([0, 1, 4, 5], False)
+    assert reached == [0, 2, 4]
+
+
+def test_a_failed_delivery_is_logged_and_released(
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    registry = DeliveryRegistry(window=60, maxsize=10)
+    monkeypatch.setattr(start, "delivery_registry", registry)
+
+    async def deliver() -> bool:
+        return True
+
+    async def fail() -> None:
+        await registry.run(user_id=1, link="link", deliver=deliver)
+        raise RuntimeError
+
+    async def run() -> None:
+        task = start.delivery_scheduler.run_in_background(fail())
+        task.add_done_callback(functools.partial(FileSender.delivery_done, user_id=1, link="link"))
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    assert "Delivery failed, user: 1" in caplog.text
+    assert registry.stats()["in_flight"] == 0
+    assert asyncio.run(registry.run(user_id=1, link="link", deliver=deliver))
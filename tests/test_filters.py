@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pyrogram.enums import ChatType
+
+from bot.utilities.pyrofilters import PyroFilters, UpdateContext
+from bot.utilities.pyrofilters import admins as admins_module
+from bot.utilities.pyrofilters.subscription import SubscriptionFilter
+
+
+class Checks:
+    """
+    Counts the admin lookups and subscription checks the filters run.
+    """
+
+    def __init__(self) -> None:
+        self.admins: set[int] = set()
+        self.admin_checks = 0
+        self.subscription_checks = 0
+
+    def is_admin(self, user_id: int) -> bool:
+        self.admin_checks += 1
+        return user_id in self.admins
+
+    async def is_subscribed(self, client: object, message: SimpleNamespace) -> bool:  # noqa: ARG002
+        self.subscription_checks += 1
+        return True
+
+
+@pytest.fixture
+def checks(monkeypatch: pytest.MonkeyPatch) -> Checks:
+    checks = Checks()
+    monkeypatch.setattr(admins_module, "db", checks)
+    monkeypatch.setattr(SubscriptionFilter, "is_subscribed", checks.is_subscribed)
+    monkeypatch.setattr(UpdateContext, "_timings", {})
+    return checks
+
+
+def private_message(user_id: int) -> SimpleNamespace:
+    return SimpleNamespace(chat=SimpleNamespace(type=ChatType.PRIVATE), from_user=SimpleNamespace(id=user_id))
+
+
+def test_a_cheap_filter_rejecting_skips_the_subscription_check(checks: Checks) -> None:
+    # Listed expensive first, ordered still evaluates the admin lookup before the subscription check.
+    flt = PyroFilters.ordered(PyroFilters.subscription(), PyroFilters.admin())
+
+    assert not asyncio.run(flt(None, private_message(user_id=1)))
+    assert checks.subscription_checks == 0
+    assert "subscribed" not in UpdateContext.stats()
+
+    checks.admins.add(1)
+    assert asyncio.run(flt(None, private_message(user_id=1)))
+    assert checks.subscription_checks == 1
+
+
+def test_handler_groups_reuse_the_update_context(checks: Checks) -> None:
+    checks.admins.add(1)
+    message = private_message(user_id=1)
+    groups = [
+        PyroFilters.ordered(PyroFilters.admin(), PyroFilters.subscription()),
+        PyroFilters.ordered(PyroFilters.subscription(), PyroFilters.admin()),
+    ]
+
+    async def dispatch() -> list[bool]:
+        return [await flt(None, message) for flt in groups]
+
+    assert asyncio.run(dispatch()) == [True, True]
+    assert checks.admin_checks == 1
+    assert checks.subscription_checks == 1
+    assert UpdateContext.of(message).memo == {"admin": True, "subscribed": True}  # type: ignore[reportArgumentType]
@@ -0,0 +1,32 @@
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from bot.config import config
+from bot.database.indexes import Indexes
+from tests.mongo import TEST_MONGO_DB_URL, requires_mongo
+
+
+class IndexedDatabase(Indexes):
+    """
+    The Indexes of MongoDB on a throwaway database.
+    """
+
+    def __init__(self, client: AsyncIOMotorClient, name: str) -> None:
+        self.db = client[name]
+
+
+@requires_mongo
+def test_hot_queries_use_an_index() -> None:
+    async def check() -> list[str]:
+        client = AsyncIOMotorClient(TEST_MONGO_DB_URL, serverSelectionTimeoutMS=5000)
+        name = f"{config.MONGO_DB_NAME}-Indexes"
+        try:
+            indexes = IndexedDatabase(client=client, name=name)
+            await indexes.ensure_indexes()
+            return await indexes.check_query_plans()
+        finally:
+            await client.drop_database(name)
+            client.close()
+
+    assert asyncio.run(check()) == []
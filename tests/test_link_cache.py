@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bot.database import MongoDB
+
+
+class FilesCollection:
+    """
+    The Files collection, only tells whether a link already existed.
+    """
+
+    def __init__(self) -> None:
+        self.links: set[str] = set()
+
+    async def update_one(self, filter: dict, update: dict, upsert: bool) -> SimpleNamespace:  # noqa: A002, ARG002, FBT001
+        matched = filter["_id"] in self.links
+        self.links.add(filter["_id"])
+        return SimpleNamespace(
+            acknowledged=True,
+            matched_count=int(matched),
+            upserted_id=None if matched else filter["_id"],
+        )
+
+
+def test_only_overwritten_links_bump_the_version(monkeypatch: pytest.MonkeyPatch) -> None:
+    database = MongoDB()
+    bumps = []
+
+    async def bump_links_version() -> None:
+        bumps.append(1)
+
+    async def increment_counters(**_: int) -> None:
+        pass
+
+    monkeypatch.setattr(database, "db", {"Files": FilesCollection()})
+    monkeypatch.setattr(database, "bump_links_version", bump_links_version)
+    monkeypatch.setattr(database, "increment_counters", increment_counters)
+
+    async def upload() -> None:
+        await database.add_file(file_link="new", file_origin=1, file_data=[])
+        await database.add_file(file_link="other", file_origin=1, file_data=[])
+        await database.add_file(file_link="new", file_origin=1, file_data=[])
+
+    asyncio.run(upload())
+    assert len(bumps) == 1
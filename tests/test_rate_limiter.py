@@ -0,0 +1,196 @@
+import asyncio
+import tracemalloc
+from collections.abc import Callable
+from types import SimpleNamespace
+
+import pytest
+from pyrogram import StopPropagation
+
+from bot.config import config
+from bot.utilities.helpers import rate_limiter
+from bot.utilities.helpers.rate_limiter import ArrivalTimeStore, RateLimiter
+from tests.clock import Clock
+
+BURST = RateLimiter.MAX_EXECUTIONS_PER_MINUTE_SAME_CHAT
+INTERVAL = RateLimiter.EMISSION_INTERVAL
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiter(monkeypatch: pytest.MonkeyPatch, clock: Clock) -> None:
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    monkeypatch.setattr(RateLimiter, "chat_arrival_times", ArrivalTimeStore(max_chats=100000))
+    monkeypatch.setattr(RateLimiter, "deferred_counts", {})
+    monkeypatch.setattr(RateLimiter, "dropped_count", 0)
+    monkeypatch.setattr(config, "RATE_LIMITER", True)
+
+
+def fake_message(chat_id: int) -> SimpleNamespace:
+    def stop_propagation() -> None:
+        raise StopPropagation
+
+    return SimpleNamespace(chat=SimpleNamespace(id=chat_id), stop_propagation=stop_propagation)
+
+
+async def is_stopped(handler: Callable, chat_id: int) -> bool:
+    try:
+        await handler(None, fake_message(chat_id=chat_id))
+    except StopPropagation:
+        return True
+    return False
+
+
+def test_burst_then_pacing(clock: Clock) -> None:
+    for _ in range(BURST):
+        assert RateLimiter.reserve(chat_id=1) == 0
+
+    assert RateLimiter.reserve(chat_id=1, reserve_late=False) == pytest.approx(INTERVAL)
+    clock.advance(INTERVAL)
+    assert RateLimiter.reserve(chat_id=1, reserve_late=False) == 0
+    assert RateLimiter.reserve(chat_id=1, reserve_late=False) == pytest.approx(INTERVAL)
+
+
+def test_sustained_rate(clock: Clock) -> None:
+    seconds = 600
+    admitted = 0
+    for _ in range(seconds * 10):
+        admitted += RateLimiter.reserve(chat_id=1, reserve_late=False) == 0
+        clock.advance(0.1)
+
+    assert admitted == pytest.approx(BURST + seconds / INTERVAL, abs=1)
+
+
+def test_noisy_chat_does_not_starve_quiet_chats(clock: Clock) -> None:
+    quiet_chats = range(2, 52)
+    admitted = dict.fromkeys([1, *quiet_chats], 0)
+    for tick in range(3000):
+        admitted[1] += RateLimiter.reserve(chat_id=1, reserve_late=False) == 0
+        if tick % 100 == 0:
+            for chat_id in quiet_chats:
+                admitted[chat_id] += RateLimiter.reserve(chat_id=chat_id, reserve_late=False) == 0
+        clock.advance(0.1)
+
+    assert all(admitted[chat_id] == 30 for chat_id in quiet_chats)  # noqa: PLR2004
+    assert admitted[1] == pytest.approx(BURST + 300 / INTERVAL, abs=1)
+
+
+def test_drop_mode_counts() -> None:
+    executions = []
+
+    @RateLimiter.hybrid_limiter(mode="drop")
+    async def handler(_: object, message: SimpleNamespace) -> None:
+        executions.append(message.chat.id)
+
+    async def flood() -> int:
+        return sum([await is_stopped(handler, chat_id=1) for _ in range(BURST + 3)])
+
+    assert asyncio.run(flood()) == 3  # noqa: PLR2004
+    assert len(executions) == BURST
+    assert RateLimiter.stats() == {"deferred": 0, "dropped": 3}
+
+
+def test_defer_mode_queues_then_drops(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "RATE_LIMITER_QUEUE_SIZE", 2)
+    executions = []
+
+    @RateLimiter.hybrid_limiter(mode="defer")
+    async def handler(_: object, message: SimpleNamespace) -> None:
+        executions.append(message.chat.id)
+
+    async def flood() -> dict[str, int]:
+        for _ in range(BURST + 3):
+            await is_stopped(handler, chat_id=1)
+        return RateLimiter.stats()
+
+    assert asyncio.run(flood()) == {"deferred": 2, "dropped": 1}
+    assert len(executions) == BURST
+
+
+def test_store_is_bounded_by_max_chats(clock: Clock) -> None:
+    store = ArrivalTimeStore(max_chats=10)
+    for chat_id in range(1000):
+        store.set(chat_id=chat_id, arrival_time=clock.now + 60, now=clock.now)
+
+    assert len(store) == 10  # noqa: PLR2004
+    assert store.get(chat_id=999, default=0) == clock.now + 60
+    assert store.get(chat_id=0, default=-1) == -1
+
+
+def test_store_sweeps_expired_chats(clock: Clock) -> None:
+    store = ArrivalTimeStore(max_chats=100000)
+    for chat_id in range(100):
+        store.set(chat_id=chat_id, arrival_time=clock.now + 1, now=clock.now)
+
+    clock.advance(2)
+    for chat_id in range(100, 150):
+        store.set(chat_id=chat_id, arrival_time=clock.now + 1, now=clock.now)
+
+    assert len(store) == 50  # noqa: PLR2004
+
+
+def test_store_evicts_the_oldest_chats_under_churn(clock: Clock) -> None:
+    # Every chat keeps an arrival time ahead of now, nothing can be swept and only max_chats bounds the store.
+    store = ArrivalTimeStore(max_chats=100)
+    sizes = set()
+    for chat_id in range(10000):
+        store.set(chat_id=chat_id, arrival_time=clock.now + 60, now=clock.now)
+        if chat_id % 10 == 0:
+            store.set(chat_id=-1, arrival_time=clock.now + 60, now=clock.now)
+        sizes.add(len(store))
+        clock.advance(0.001)
+
+    assert max(sizes) == 100  # noqa: PLR2004
+    assert store.get(chat_id=-1, default=0) > 0
+    assert all(store.get(chat_id=chat_id, default=0) == 0 for chat_id in range(9900))
+    assert all(store.get(chat_id=chat_id, default=0) > 0 for chat_id in range(9901, 10000))
+
+
+def test_store_sweep_batch_is_configurable(clock: Clock) -> None:
+    store = ArrivalTimeStore(max_chats=100000, sweep_batch=10)
+    for chat_id in range(100):
+        store.set(chat_id=chat_id, arrival_time=clock.now + 1, now=clock.now)
+
+    clock.advance(2)
+    for chat_id in range(100, 110):
+        store.set(chat_id=chat_id, arrival_time=clock.now + 1, now=clock.now)
+
+    assert len(store) == 10  # noqa: PLR2004
+    assert ArrivalTimeStore(max_chats=10, sweep_batch=1).sweep_batch == 2  # noqa: PLR2004
+
+
+def test_store_memory_per_chat(clock: Clock) -> None:
+    # Measured at about 160 bytes per chat on CPython 3.11, the bound leaves room for other versions.
+    chats = 100000
+    store = ArrivalTimeStore(max_chats=chats)
+    tracemalloc.start()
+    for chat_id in range(chats):
+        store.set(chat_id=10**9 + chat_id, arrival_time=clock.now + 60, now=clock.now)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(store) == chats
+    assert size / chats < 250  # noqa: PLR2004
+
+
+def test_store_sweeps_its_only_chat(clock: Clock) -> None:
+    store = ArrivalTimeStore(max_chats=100000)
+    store.set(chat_id=1, arrival_time=clock.now, now=clock.now)
+
+    assert len(store) == 0
+
+
+def test_reserve_admission_counts(clock: Clock) -> None:
+    # Many chats reserving at the same instant are admitted and rejected independently of each other.
+    chats = 1000
+    admitted = rejected = 0
+    for _ in range(BURST + 5):
+        for chat_id in range(chats):
+            if RateLimiter.reserve(chat_id=chat_id, reserve_late=False) == 0:
+                admitted += 1
+            else:
+                rejected += 1
+
+    assert admitted == chats * BURST
+    assert rejected == chats * 5
+
+    clock.advance(60)
+    assert all(RateLimiter.reserve(chat_id=chat_id, reserve_late=False) == 0 for chat_id in range(chats))
@@ -0,0 +1,227 @@
+import asyncio
+import datetime
+from collections.abc import Callable
+
+import pytest
+from pyrogram.errors import FloodWait, MessageDeleteForbidden
+
+from bot.config import config
+from bot.utilities import schedule_manager as schedule_manager_module
+from bot.utilities.helpers import SendScheduler
+from bot.utilities.schedule_manager import ScheduleManager
+from tests.clock import Clock
+
+
+class AutoDeleteQueue:
+    """
+    The AutoDelete collection methods of MongoDB, kept in memory.
+    """
+
+    def __init__(self, clock: Clock) -> None:
+        self.clock = clock
+        self.documents: dict[int, dict] = {}
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.clock.time(), tz=datetime.timezone.utc)
+
+    async def push_auto_delete(self, chat_id: int, message_ids: list[int], delete_at: datetime.datetime) -> bool:
+        for document in self.documents.values():
+            if document["chat_id"] == chat_id and document["delete_at"] == delete_at:
+                document["message_ids"].extend(message_ids)
+                return True
+        queue_id = len(self.documents) + 1
+        self.documents[queue_id] = {"_id": queue_id, "chat_id": chat_id, "delete_at": delete_at, "message_ids": []}
+        self.documents[queue_id]["message_ids"].extend(message_ids)
+        return True
+
+    async def get_due_auto_deletes(self, limit: int) -> list[dict]:
+        due = sorted(
+            (document for document in self.documents.values() if document["delete_at"] <= self.now()),
+            key=lambda document: document["delete_at"],
+        )
+        return [dict(document, message_ids=list(document["message_ids"])) for document in due[:limit]]
+
+    async def clear_auto_deletes(self, queue_ids: list) -> None:
+        for queue_id in queue_ids:
+            self.documents.pop(queue_id, None)
+
+    async def postpone_auto_deletes(self, queue_ids: list, delete_at: datetime.datetime) -> None:
+        for queue_id in queue_ids:
+            self.documents[queue_id]["delete_at"] = delete_at
+
+
+class DeletingClient:
+    """
+    Records delete_messages calls, chats in errors raise their error instead.
+    """
+
+    def __init__(self, errors: dict[int, Exception] | None = None) -> None:
+        self.errors = errors or {}
+        self.calls: list[tuple[int, list[int]]] = []
+
+    async def delete_messages(self, chat_id: int, message_ids: list[int]) -> int:
+        if chat_id in self.errors:
+            raise self.errors[chat_id]
+        self.calls.append((chat_id, message_ids))
+        return len(message_ids)
+
+
+@pytest.fixture
+def queue(
+    monkeypatch: pytest.MonkeyPatch,
+    clock: Clock,
+    fast_send_scheduler: Callable[[], SendScheduler],
+) -> AutoDeleteQueue:
+    queue = AutoDeleteQueue(clock)
+    monkeypatch.setattr(schedule_manager_module, "database", queue)
+    monkeypatch.setattr(schedule_manager_module, "time", clock)
+    monkeypatch.setattr(schedule_manager_module, "send_scheduler", fast_send_scheduler())
+    return queue
+
+
+def process(manager: ScheduleManager, client: DeletingClient) -> None:
+    manager.client = client  # type: ignore[reportAttributeAccessIssue]
+    asyncio.run(manager.process_due_deletes())
+
+
+def test_due_buckets_are_deleted_and_cleared(
+    queue: AutoDeleteQueue,
+    clock: Clock,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    released = []
+    monkeypatch.setattr(
+        schedule_manager_module.delivery_registry,
+        "release_user",
+        lambda user_id: released.append(user_id),
+    )
+    manager = ScheduleManager()
+    client = DeletingClient()
+    asyncio.run(
+        manager.schedule_delete(client=client, chat_id=1, message_ids=[1, 2], delete_n_seconds=60),  # type: ignore[reportArgumentType]
+    )
+
+    process(manager, client)
+    assert client.calls == []
+
+    clock.advance(60 + config.AUTO_DELETE_GRANULARITY)
+    process(manager, client)
+    assert client.calls == [(1, [1, 2])]
+    assert queue.documents == {}
+    assert released == [1]
+
+
+def test_flood_waited_chat_is_postponed(
+    queue: AutoDeleteQueue,
+    clock: Clock,
+    monkeypatch: pytest.MonkeyPatch,
+    fast_send_scheduler: Callable[[], SendScheduler],
+) -> None:
+    manager = ScheduleManager()
+    client = DeletingClient(errors={1: FloodWait(value=300)})
+    for chat_id in (1, 2):
+        asyncio.run(queue.push_auto_delete(chat_id=chat_id, message_ids=[chat_id], delete_at=queue.now()))
+
+    process(manager, client)
+    assert client.calls == [(2, [2])]
+    assert [document["chat_id"] for document in queue.documents.values()] == [1]
+    assert queue.documents[1]["delete_at"] >= queue.now() + datetime.timedelta(seconds=300)
+
+    # The send scheduler keeps the chat paused for the FloodWait in real time.
+    monkeypatch.setattr(schedule_manager_module, "send_scheduler", fast_send_scheduler())
+    client.errors.clear()
+    clock.advance(300 + config.AUTO_DELETE_GRANULARITY)
+    process(manager, client)
+    assert client.calls == [(2, [2]), (1, [1])]
+    assert queue.documents == {}
+
+
+def test_zero_second_flood_wait_is_postponed_a_tick(queue: AutoDeleteQueue) -> None:
+    manager = ScheduleManager()
+    client = DeletingClient(errors={1: FloodWait(value=0)})
+    asyncio.run(queue.push_auto_delete(chat_id=1, message_ids=[1], delete_at=queue.now()))
+
+    process(manager, client)
+    assert queue.documents[1]["delete_at"] > queue.now()
+
+
+def test_permanent_errors_are_cleared(queue: AutoDeleteQueue) -> None:
+    manager = ScheduleManager()
+    client = DeletingClient(errors={1: MessageDeleteForbidden()})
+    asyncio.run(queue.push_auto_delete(chat_id=1, message_ids=[1], delete_at=queue.now()))
+
+    process(manager, client)
+    assert queue.documents == {}
+
+
+def test_schedule_interval_can_run_now() -> None:
+    manager = ScheduleManager()
+    runs = []
+
+    async def job() -> None:
+        runs.append(1)
+
+    async def start() -> None:
+        manager.scheduler.start()
+        manager.schedule_interval(func=job, seconds=3600, run_now=True)
+        manager.schedule_interval(func=job, seconds=3600)
+        await asyncio.sleep(0.2)
+        manager.scheduler.shutdown(wait=False)
+
+    asyncio.run(start())
+    assert runs == [1]
+
+
+def simulate_links(queue: AutoDeleteQueue, clock: Clock, users: int, links: int) -> tuple[int, int]:
+    """
+    Every user opens links spread over a minute, each delivering 3 messages deleted after 10 minutes.
+    The polling job runs once per tick until every message is deleted.
+
+    Returns:
+        tuple[int, int]: The delete_messages calls and the most queue documents held at once.
+    """
+    manager = ScheduleManager()
+    client = DeletingClient()
+    peak_documents = 0
+
+    async def run() -> None:
+        nonlocal peak_documents
+        for link in range(links):
+            for user_id in range(users):
+                message_ids = [link * 3 + i for i in range(3)]
+                await manager.schedule_delete(client, chat_id=user_id, message_ids=message_ids, delete_n_seconds=600)  # type: ignore[reportArgumentType]
+            peak_documents = max(peak_documents, len(queue.documents))
+            clock.advance(60 / links)
+
+        manager.client = client  # type: ignore[reportAttributeAccessIssue]
+        while queue.documents:
+            clock.advance(config.AUTO_DELETE_GRANULARITY)
+            await manager.process_due_deletes()
+
+    asyncio.run(run())
+    assert sum(len(message_ids) for _, message_ids in client.calls) == users * links * 3
+    return len(client.calls), peak_documents
+
+
+def test_links_in_a_minute_cost_one_delete_per_tick(queue: AutoDeleteQueue, clock: Clock) -> None:
+    # One job per delivery used to cost 20 delete RPCs and 20 scheduler jobs for 20 links.
+    calls, peak_documents = simulate_links(queue, clock, users=1, links=20)
+
+    assert calls <= 60 / config.AUTO_DELETE_GRANULARITY + 1
+    assert peak_documents == calls
+
+
+def test_many_users_cost_one_delete_per_user_and_tick(queue: AutoDeleteQueue, clock: Clock) -> None:
+    calls, peak_documents = simulate_links(queue, clock, users=100, links=20)
+
+    assert calls <= 100 * (60 / config.AUTO_DELETE_GRANULARITY + 1)
+    assert peak_documents == calls
+
+
+def test_a_bucket_is_deleted_100_messages_per_call(queue: AutoDeleteQueue) -> None:
+    manager = ScheduleManager()
+    client = DeletingClient()
+    asyncio.run(queue.push_auto_delete(chat_id=1, message_ids=list(range(250)), delete_at=queue.now()))
+
+    process(manager, client)
+    assert [len(message_ids) for _, message_ids in client.calls] == [100, 100, 50]
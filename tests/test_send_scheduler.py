@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+from pyrogram.errors import FloodWait
+
+from bot.utilities.helpers import SendPriority, SendScheduler
+
+
+def test_chat_burst_then_pacing() -> None:
+    scheduler = SendScheduler(global_rate=1000, chat_rate=20, chat_burst=3, max_retries=0)
+
+    async def send_six() -> list[float]:
+        started = time.monotonic()
+        sent = []
+
+        async def send() -> None:
+            sent.append(time.monotonic() - started)
+
+        await asyncio.gather(*(scheduler.send(1, send) for _ in range(6)))
+        return sent
+
+    sent = asyncio.run(send_six())
+    assert max(sent[:3]) < 0.03  # noqa: PLR2004
+    assert sent[5] >= 0.14  # noqa: PLR2004
+
+
+def test_chats_do_not_share_a_budget() -> None:
+    scheduler = SendScheduler(global_rate=1000, chat_rate=1, chat_burst=1, max_retries=0)
+
+    async def send_to_many_chats() -> float:
+        started = time.monotonic()
+
+        async def send() -> None:
+            pass
+
+        await asyncio.gather(*(scheduler.send(chat_id, send) for chat_id in range(100)))
+        return time.monotonic() - started
+
+    assert asyncio.run(send_to_many_chats()) < 0.5  # noqa: PLR2004
+
+
+def test_interactive_sends_go_ahead_of_broadcasts() -> None:
+    scheduler = SendScheduler(global_rate=20, chat_rate=100, chat_burst=1, max_retries=0)
+
+    async def send_mixed() -> list[SendPriority]:
+        order = []
+
+        async def send(priority: SendPriority) -> None:
+            order.append(priority)
+
+        broadcasts = [
+            scheduler.send(chat_id, send, SendPriority.BROADCAST, priority=SendPriority.BROADCAST)
+            for chat_id in range(25)
+        ]
+        interactive = [
+            scheduler.send(chat_id, send, SendPriority.INTERACTIVE, priority=SendPriority.INTERACTIVE)
+            for chat_id in range(100, 105)
+        ]
+        await asyncio.gather(*broadcasts, *interactive)
+        return order
+
+    order = asyncio.run(send_mixed())
+    assert order[:5] == [SendPriority.INTERACTIVE] * 5
+    assert order[5:] == [SendPriority.BROADCAST] * 25
+
+
+def test_flood_wait_is_retried_and_slows_down() -> None:
+    scheduler = SendScheduler(global_rate=30, chat_rate=100, chat_burst=1, max_retries=2)
+    calls = []
+
+    async def send() -> str:
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise FloodWait(value=0)
+        return "sent"
+
+    assert asyncio.run(scheduler.send(1, send)) == "sent"
+    assert len(calls) == 2  # noqa: PLR2004
+    assert scheduler.stats()["flood_waits"] == 1
+    assert scheduler.global_rate == pytest.approx(15 + SendScheduler.RATE_RECOVERY)
+
+
+def test_flood_wait_is_raised_after_max_retries() -> None:
+    scheduler = SendScheduler(global_rate=30, chat_rate=100, chat_burst=1, max_retries=2)
+    calls = []
+
+    async def send() -> None:
+        calls.append(time.monotonic())
+        raise FloodWait(value=0)
+
+    with pytest.raises(FloodWait):
+        asyncio.run(scheduler.send(1, send))
+    assert len(calls) == 3  # noqa: PLR2004
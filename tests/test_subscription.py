@@ -0,0 +1,100 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from lru import LRU
+from pyrogram.enums import ChatMemberStatus
+from pyrogram.errors import UserNotParticipant
+
+from bot.config import config
+from bot.utilities.pyrofilters import subscription as subscription_module
+from bot.utilities.pyrofilters.subscription import SubscriptionFilter
+
+PUBLIC_CHANNEL = -1001
+PRIVATE_CHANNEL = -1002
+
+
+class MemberClient:
+    """
+    Answers get_chat_member from the channels the user joined and counts the calls.
+    """
+
+    def __init__(self, joined: set[int]) -> None:
+        self.joined = joined
+        self.calls = 0
+
+    async def get_chat_member(self, chat_id: int, user_id: int) -> SimpleNamespace:  # noqa: ARG002
+        self.calls += 1
+        if chat_id not in self.joined:
+            raise UserNotParticipant
+        return SimpleNamespace(status=ChatMemberStatus.MEMBER)
+
+
+class UserDatabase:
+    """
+    The user methods of MongoDB the subscription check uses, join requests are kept in memory.
+    """
+
+    def __init__(self) -> None:
+        self.channels: list[int] = []
+
+    def is_user_banned(self, user_id: int) -> bool:  # noqa: ARG002
+        return False
+
+    async def upsert_user(self, user_id: int) -> dict:  # noqa: ARG002
+        return {"channels": list(self.channels)}
+
+    def pending_user_channels(self, user_id: int) -> set[int]:  # noqa: ARG002
+        return set()
+
+
+@pytest.fixture
+def database(monkeypatch: pytest.MonkeyPatch) -> UserDatabase:
+    database = UserDatabase()
+    monkeypatch.setattr(subscription_module, "database", database)
+    monkeypatch.setattr(SubscriptionFilter, "_subs_cache", LRU(100))
+    monkeypatch.setattr(config, "PRIVATE_REQUEST", True)
+    monkeypatch.setattr(config, "FORCE_SUB_CHANNELS", [PUBLIC_CHANNEL, PRIVATE_CHANNEL])
+    monkeypatch.setattr(
+        config,
+        "channels_n_invite",
+        {
+            "Public": {"is_private": False, "invite_link": "", "channel_id": PUBLIC_CHANNEL},
+            "Private": {"is_private": True, "invite_link": "", "channel_id": PRIVATE_CHANNEL},
+        },
+    )
+    return database
+
+
+def is_subscribed(client: MemberClient) -> bool:
+    message = SimpleNamespace(from_user=SimpleNamespace(id=1))
+    return asyncio.run(SubscriptionFilter.check_channels(client=client, message=message))  # type: ignore[reportArgumentType]
+
+
+@pytest.mark.usefixtures("database")
+def test_memberships_are_cached() -> None:
+    client = MemberClient(joined={PUBLIC_CHANNEL, PRIVATE_CHANNEL})
+
+    assert is_subscribed(client)
+    assert is_subscribed(client)
+    assert client.calls == 2  # noqa: PLR2004
+
+
+@pytest.mark.usefixtures("database")
+def test_a_missing_membership_is_not_cached() -> None:
+    client = MemberClient(joined={PUBLIC_CHANNEL})
+
+    assert not is_subscribed(client)
+    client.joined.add(PRIVATE_CHANNEL)
+    assert is_subscribed(client)
+
+
+def test_a_declined_join_request_is_not_cached(database: UserDatabase) -> None:
+    client = MemberClient(joined={PUBLIC_CHANNEL})
+    database.channels.append(PRIVATE_CHANNEL)
+
+    assert is_subscribed(client)
+    # The request is declined, only the public channel membership was cached.
+    database.channels.clear()
+    assert not is_subscribed(client)
+    assert client.calls == 3  # noqa: PLR2004